@@ -0,0 +1,55 @@
+"""
+Benchmark: reference simulate() vs. the slotted fast engine.
+
+Run from the repository root:
+    python -m benchmarks.bench_engine [--repeat 3] [--T 3000]
+
+Checks that both produce bit-for-bit identical arrays and reports the speedup.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.sim_config import SimulationConfig
+from src.simulation import simulate
+from src.engine import simulate_fast
+
+
+def best_time(fn, cfg, repeat):
+    """Best wall-clock time of `repeat` runs and the result of the last one."""
+    best, res = float('inf'), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        res = fn(cfg)
+        best = min(best, time.perf_counter() - t0)
+    return best, res
+
+
+def identical(ref: dict, fast: dict) -> list:
+    """Names of all array entries that differ bit-wise between two results."""
+    return [key for key, val in ref.items()
+            if isinstance(val, np.ndarray) and val.tobytes() != fast[key].tobytes()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--T', type=float, default=3000.0)
+    args = parser.parse_args()
+
+    cfg = SimulationConfig(T=args.T)
+    t_ref, ref = best_time(simulate, cfg, args.repeat)
+    t_fast, fast = best_time(simulate_fast, cfg, args.repeat)
+    diff = identical(ref, fast)
+
+    print(f"T={cfg.T:.0f} s, dt={cfg.dt} s, {len(ref['t'])} Schritte")
+    print(f"simulate()      : {t_ref*1e3:9.1f} ms")
+    print(f"simulate_fast() : {t_fast*1e3:9.1f} ms   (Speedup x{t_ref / t_fast:.1f})")
+    print("Ergebnis bit-identisch" if not diff else f"ABWEICHUNG in: {', '.join(diff)}")
+    if diff:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+Benchmark and regression suite: single run, long horizon, batch, adaptive stepping, N-area network and
+equivalence of the ensemble, network and cache-resume paths with the fixed-step engine.
+
+Run from the repository root:
+    python -m benchmarks.bench_suite [--repeat 3] [--time-tol 0.5] [--no-timing] [--update] [--profile]
+
+Every case is timed (best of --repeat) and its KPIs are compared with benchmarks/baselines.json.
+KPIs must match to 1e-9 (relative); a case is a performance regression if it is slower than
+baseline * (1 + time-tol). Cases that check a property raise ValueError when it fails (reported as
+FEHLER); the adaptive case also fails unless it is faster than simulate_fast. Exits with status 1 on
+any regression. --update rewrites the baselines
+(timings are machine dependent: refresh them on the machine that runs the checks, or use --no-timing).
+--profile additionally prints the per-stage profile of simulate() and the per-phase profile of simulate_fast().
+"""
+import argparse
+import json
+import os
+import platform
+import time
+
+import numpy as np
+
+from src.sim_config import SimulationConfig
+from src.simulation import simulate
+from src.engine import SIGNALS, simulate_fast
+from src.ensemble import simulate_ensemble, select_scenario
+from src.kpi import kpi_values, run_kpis
+from src.profiling import simulate_profiled, profile_fast, format_profile
+from src.adaptive import ACCURACY_TOL_HZ, simulate_adaptive, error_report
+from src.network import simulate_network, ring_network
+from src.cache import ResultCache, cached_simulate
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines.json')
+KPI_RTOL = 1e-9
+
+
+def case_reference():
+    return kpi_values(simulate(SimulationConfig()))
+
+
+def case_single():
+    return kpi_values(simulate_fast(SimulationConfig()))
+
+
+def case_long_horizon():
+    """10 h run with online KPIs only (no time series stored)."""
+    return run_kpis(SimulationConfig(T=36000.0))
+
+
+def case_batch():
+    """32 scenarios (P_loss x bess_mode) in one vectorized ensemble run."""
+    cfgs = [SimulationConfig(P_loss=p, bess_mode=m) for p in np.linspace(1e9, 4e9, 16) for m in ('afrr_and_damping', 'off')]
+    res = simulate_ensemble(cfgs)
+    kpis = [kpi_values(select_scenario(res, i)) for i in range(len(cfgs))]
+    ttr = [k['ttr_s'] for k in kpis if k['ttr_s'] is not None]
+    return {'nadir_hz_min': min(k['nadir_hz'] for k in kpis), 'nadir_hz_mean': float(np.mean([k['nadir_hz'] for k in kpis])),
+            'ttr_s_max': max(ttr) if ttr else None, 'n_recovered': len(ttr),
+            'max_import_mw_max': max(k['max_import_mw'] for k in kpis)}
+
+
+def case_adaptive():
+    """Adaptive run of the default config; fails if it deviates by more than 1 mHz from simulate_fast
+    or is not faster than it (best of 5 alternating runs each)."""
+    cfg = SimulationConfig()
+    t_fast = t_adaptive = float('inf')
+    for _ in range(5):
+        t0 = time.perf_counter()
+        ref = simulate_fast(cfg)
+        t1 = time.perf_counter()
+        res = simulate_adaptive(cfg)
+        t_fast, t_adaptive = min(t_fast, t1 - t0), min(t_adaptive, time.perf_counter() - t1)
+    report = error_report(res, ref)
+    if report['max_abs_err_f_hz'] > ACCURACY_TOL_HZ:
+        raise ValueError(f"Adaptive run deviates by {report['max_abs_err_f_hz'] * 1e3:.3f} mHz from simulate_fast.")
+    if t_adaptive >= t_fast:
+        raise ValueError(f"Adaptive run is not faster than simulate_fast ({t_adaptive * 1e3:.1f} ms vs {t_fast * 1e3:.1f} ms).")
+    return {key: report[key] for key in ('steps', 'max_abs_err_f_hz', 'nadir_err_hz', 'ttr_err_s')}
+
+
+def check_equal(res: dict, ref: dict, what: str):
+    """Raises ValueError if a signal of res is not bit-identical to the fixed-step engine result ref."""
+    bad = [name for name in SIGNALS if not np.array_equal(res[name], ref[name])]
+    if bad:
+        raise ValueError(f"{what} differs from simulate_fast in {', '.join(bad)}.")
+
+
+def case_ensemble_equiv():
+    """Every ensemble row (default, 1.5 GW, BESS off, coupled) equals simulate_fast of its config."""
+    cfgs = [SimulationConfig(T=600.0, **kw) for kw in ({}, {'P_loss': 1.5e9}, {'bess_mode': 'off'}, {'bess_mode': 'coupled'})]
+    res = simulate_ensemble(cfgs)
+    for i, cfg in enumerate(cfgs):
+        check_equal(select_scenario(res, i), simulate_fast(cfg), f"Ensemble scenario {i}")
+    return {'n_scenarios': len(cfgs), 'nadir_hz_min': float(res['f_bawu'].min())}
+
+
+def case_network_equiv():
+    """simulate_network with the default two-area network equals simulate_fast."""
+    cfg = SimulationConfig()
+    res = simulate_network(cfg)
+    check_equal(res, simulate_fast(cfg), "simulate_network (two areas)")
+    return kpi_values(res)
+
+
+def case_cache_resume():
+    """A run resumed from a cached checkpoint (changed mfrr_delay) equals a fresh simulate_fast run."""
+    cache = ResultCache()
+    cached_simulate(SimulationConfig(), cache)
+    cfg = SimulationConfig(mfrr_delay=450.0)
+    res = cached_simulate(cfg, cache)
+    if cache.stats['resumed'] != 1:
+        raise ValueError(f"Expected one resumed run, cache stats: {cache.stats}.")
+    check_equal(res, simulate_fast(cfg), "Resumed cached run")
+    return kpi_values(res)
+
+
+def case_network_bias():
+    """4-area ring: doubling the bias of area 0 must change the study-area response (300 MW loss, so
+    the study-area AGC is not saturated)."""
+    cfg = SimulationConfig(T=600.0, P_loss=300e6)
+    net = ring_network(cfg, 4, afrr_max=200e6)
+    base = simulate_network(cfg, net)
+    net.B_bias = net.B_bias * np.array([2.0, 1.0, 1.0, 1.0])
+    biased = simulate_network(cfg, net)
+    if np.array_equal(base['f_area'], biased['f_area']):
+        raise ValueError("B_bias of area 0 has no effect on the network run.")
+    return {'nadir_hz': float(base['f_bawu'].min()), 'nadir_hz_biased': float(biased['f_bawu'].min()),
+            'max_abs_diff_hz': float(np.max(np.abs(base['f_area'] - biased['f_area'])))}
+
+
+CASES = {'reference': case_reference, 'single': case_single, 'long_horizon': case_long_horizon, 'batch': case_batch,
+         'adaptive': case_adaptive, 'network_bias': case_network_bias, 'ensemble_equiv': case_ensemble_equiv,
+         'network_equiv': case_network_equiv, 'cache_resume': case_cache_resume}
+
+
+def run_case(fn, repeat):
+    """Best wall-clock time of `repeat` runs and the KPIs of the last one."""
+    best, kpis = float('inf'), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        kpis = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, kpis
+
+
+def kpi_mismatches(kpis: dict, base: dict) -> list:
+    """KPI names whose value differs from the baseline (beyond KPI_RTOL)."""
+    bad = []
+    for key in sorted(set(kpis) | set(base)):
+        a, b = kpis.get(key), base.get(key)
+        if a is None or b is None:
+            if a is not b:
+                bad.append(key)
+        elif abs(a - b) > KPI_RTOL * max(abs(a), abs(b), 1e-12):
+            bad.append(key)
+    return bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--time-tol', type=float, default=0.5)
+    parser.add_argument('--no-timing', action='store_true')
+    parser.add_argument('--update', action='store_true')
+    parser.add_argument('--profile', action='store_true')
+    parser.add_argument('--cases', nargs='*', default=list(CASES), choices=list(CASES))
+    args = parser.parse_args()
+
+    baselines = {'cases': {}}
+    if os.path.exists(BASELINES):
+        with open(BASELINES, encoding='utf-8') as fh:
+            baselines = json.load(fh)
+
+    failed = False
+    results = {}
+    for name in args.cases:
+        try:
+            t, kpis = run_case(CASES[name], args.repeat)
+        except ValueError as e:
+            print(f"{name:<14} FEHLER: {e}")
+            failed = True
+            continue
+        results[name] = {'time_s': t, 'kpis': kpis}
+        base = baselines['cases'].get(name)
+        status = []
+        if base is None:
+            status.append('keine Baseline')
+        else:
+            bad = kpi_mismatches(kpis, base['kpis'])
+            if bad:
+                status.append(f"KPI-ABWEICHUNG: {', '.join(bad)}")
+            if not args.no_timing and t > base['time_s'] * (1 + args.time_tol):
+                status.append(f"LANGSAMER: {t / base['time_s']:.2f}x Baseline")
+            failed = failed or bool(bad) or (not args.no_timing and t > base['time_s'] * (1 + args.time_tol))
+        ref = f"(Baseline {base['time_s'] * 1e3:9.1f} ms)" if base else ''
+        print(f"{name:<14}{t * 1e3:9.1f} ms {ref}  {'; '.join(status) or 'ok'}")
+
+    if args.profile:
+        _, profile = simulate_profiled(SimulationConfig())
+        print(format_profile(profile))
+        _, profile = profile_fast(SimulationConfig(), repeat=args.repeat)
+        print(format_profile(profile))
+
+    if args.update:
+        baselines['cases'].update(results)
+        baselines['meta'] = {'python': platform.python_version(), 'numpy': np.__version__,
+                             'machine': platform.machine(), 'repeat': args.repeat}
+        with open(BASELINES, 'w', encoding='utf-8') as fh:
+            json.dump(baselines, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+        print(f"Baselines geschrieben: {BASELINES}")
+    elif failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
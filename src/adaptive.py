@@ -0,0 +1,232 @@
+import copy
+
+import numpy as np
+from src.sim_config import SimulationConfig
+from src.engine import SIGNALS, EngineConstants, EngineState, TimeAxis, allocate_outputs, advance, n_steps_for, simulate_fast
+from src.kpi import kpi_values
+
+# -------------------- Adaptive / Event-Driven Stepping --------------------
+# Segment-wise variable step on top of engine.advance: every segment runs the unchanged engine
+# loop with a step h = n * cfg.dt (n a power of two, all per-dt rates of EngineConstants scaled
+# with h). Each segment is computed once; its local error against cfg.dt steps is estimated from
+# the second differences of the outputs. Segments above the tolerances are retried with half the
+# step, well-resolved ones double it for the next segment. n = 1 is the fixed-step engine itself.
+# Segments end on the fault/activation steps and use cfg.dt for event_window seconds after each of
+# them, while |Δf| is within switch_band of a switching threshold, and again (for the span of the
+# segment) if they cross a threshold of a discrete decision (deadband, trim, BESS share, λ handover).
+
+class AdaptiveOptions:
+    """Tuning of the adaptive integrator (tolerances in Hz, W and per-unit)."""
+    def __init__(self, **kwargs):
+        self.h_max = kwargs.get('h_max', 3.2)           # largest step [s] (rounded down to a power-of-two multiple of cfg.dt)
+        self.segment = kwargs.get('segment', 64)        # steps per segment
+        self.fixed = kwargs.get('fixed', 256)           # steps per segment at cfg.dt
+        self.tol_f = kwargs.get('tol_f', 2e-5)          # estimated error vs cfg.dt steps per segment, frequency [Hz]
+        self.tol_p = kwargs.get('tol_p', 2e4)           # same for the power states [W]
+        self.tol_pu = kwargs.get('tol_pu', 1e-4)        # same for SoC and BESS share
+        self.event_window = kwargs.get('event_window', 2.0)  # seconds of cfg.dt steps after every activation event
+        self.switch_band = kwargs.get('switch_band', 5e-3)   # cfg.dt steps while |Δf| is this close to a switching threshold [Hz]
+        # Steady-state termination (None disables it)
+        self.ss_hold = kwargs.get('ss_hold', 60.0)      # all rates below the limits for this long [s]
+        self.ss_rocof = kwargs.get('ss_rocof', 1e-5)    # [Hz/s]
+        self.ss_rate_frac = kwargs.get('ss_rate_frac', 1e-3)  # power/share rates as a fraction of their full-scale rate (see steady_rates)
+
+
+ACCURACY_TOL_HZ = 1e-3  # max. frequency deviation from simulate_fast accepted by check_accuracy()
+
+
+# State checked for the steady state
+_MONITORED = ['f_bawu', 'f_fr', 'p_fcr_bw', 'p_fcr_fr', 'integral_term', 'p_k', 'p_f', 'p_g1', 'p_g2', 'p_mfrr',
+              'lambda_share', 'bess_share']
+_DF_THRESHOLDS = ('bess_deadband', 'df_close_hz', 'df_trim_in', 'restore_tol_hz')  # switching thresholds on |Δf|
+_EVENT_STEPS = ('k_fault', 'k_bess', 'k_f', 'k_g1', 'k_g2', 'k_assist', 'k_mfrr')
+
+
+def steady_rates(cfg: SimulationConfig, opts: 'AdaptiveOptions') -> list:
+    """Rate limits of the steady-state test in the order of _MONITORED: ss_rocof for the frequencies,
+    ss_rate_frac times the full-scale rate of every controller otherwise (ramp of the plant, FCR and AGC
+    at full activation, λ and BESS share ramps)."""
+    c = EngineConstants(cfg)
+    full = [c.fcr_bw_max / cfg.fcr_tau, c.fcr_fr_max / cfg.fcr_tau, c.Ki * c.B_bias * cfg.restore_tol_hz,
+            cfg.bess_ramp_out_mw_per_sec * 1e6, cfg.f_ramp, cfg.gud1_ramp, cfg.gud2_ramp, cfg.mfrr_ramp,
+            cfg.lambda_rise, c.share_down / cfg.dt]
+    return [opts.ss_rocof] * 2 + [opts.ss_rate_frac * r for r in full]
+
+
+def _switches(s: EngineState, c: EngineConstants) -> tuple:
+    """Side of every threshold of the discrete decisions in advance() (deadband, trim, BESS share,
+    λ handover) for the state s."""
+    df = abs(s.f_bawu - c.F0)
+    slow = s.p_f + s.p_g1 + s.p_g2
+    return (df > c.bess_deadband, df <= c.df_close_hz, df <= c.df_trim_in, df <= c.restore_tol_hz,
+            slow > c.slow_limit, abs(s.integral_term) > c.ace_thresh,
+            abs(s.P_k + slow) / c.total_afrr_cap > c.util_thresh)
+
+
+def _crossed(s: EngineState, new: EngineState, out: dict, m: int, c: EngineConstants) -> bool:
+    """True if a segment of m samples from s to new crossed a decision threshold: the frequency thresholds
+    are checked on every sample (they can be crossed and re-crossed within the segment), the others at its ends."""
+    if _switches(s, c) != _switches(new, c):
+        return True
+    df = np.abs(np.append(out['f_bawu'][:m], new.f_bawu) - c.F0)
+    lo, hi = df.min(), df.max()
+    return any(lo <= getattr(c, a) < hi for a in _DF_THRESHOLDS)
+
+
+class _Stepper:
+    """Runs segments of the engine loop with step n * cfg.dt from the fine step K of the run."""
+    def __init__(self, cfg: SimulationConfig, base: EngineConstants, segment: int, fixed: int):
+        self.cfg, self.base, self.segment, self.fixed = cfg, base, segment, fixed
+        self.consts, self.buffers = {}, {}
+
+    def run(self, s: EngineState, K: int, n: int, m: int, h_prev: float):
+        """m steps of n * dt from a copy of s; returns the new state and the output buffers."""
+        c = self.consts.get(n)
+        if c is None:
+            cfg_h = copy.copy(self.cfg)
+            cfg_h.dt = n * self.cfg.dt
+            c = self.consts[n] = EngineConstants(cfg_h)
+            self.buffers[n] = allocate_outputs(self.fixed if n == 1 else self.segment)
+        # Local step j (starting at 1) is the fine step K + (j - 1) * n
+        for name in _EVENT_STEPS:
+            setattr(c, name, 1 + -(-(getattr(self.base, name) - K) // n))
+        st = s.copy()
+        df = st.f_bawu - c.F0
+        st.prev_df = df - (df - st.prev_df) * (c.dt / h_prev)  # keeps the RoCoF estimate across step changes
+        st.k = 1
+        advance(st, c, self.buffers[n], m + 1, offset=1)
+        return st, self.buffers[n]
+
+
+# Signals whose second differences estimate the local error of a segment: (signal, tolerance key)
+_ERROR_SIGNALS = [('f_bawu', 'f'), ('f_fr', 'f'), ('P_fcr_bw', 'p'), ('P_fcr_fr', 'p'), ('P_k', 'p'), ('P_f', 'p'),
+                  ('P_g1', 'p'), ('P_g2', 'p'), ('P_mfrr', 'p'), ('SoC', 'pu'), ('bess_share_history', 'pu')]
+
+
+def _segment_error(out: dict, m: int, n: int, tol: dict) -> float:
+    """Error of m explicit-Euler steps of n * dt against n times as many steps of dt, relative to the
+    tolerances: per step about (1 - 1/n) / 2 * |second difference| (exact for the linear ramps)."""
+    scale = (1.0 - 1.0 / n) / 2.0
+    return max(scale * float(np.sum(np.abs(np.diff(out[name][:m], 2)))) / tol[key] for name, key in _ERROR_SIGNALS)
+
+
+def simulate_adaptive(cfg: SimulationConfig, opts: AdaptiveOptions = None) -> dict:
+    """
+    Adaptive-step run of the engine model. The result has the layout of simulate(), but on a
+    non-uniform time axis (a subset of the fixed-step axis) that ends at 't_end' (< cfg.T if the
+    steady state was reached early). Use resample() for a uniform grid and error_report() or
+    check_accuracy() to compare against the fixed-step run.
+    """
+    opts = opts or AdaptiveOptions()
+    axis = TimeAxis(cfg)
+    base = EngineConstants(cfg, axis)
+    n_total = axis.n_steps - 1
+    n_max = 2 ** max(0, int(np.floor(np.log2(opts.h_max / cfg.dt + 1e-9))))
+    events = sorted(set(k for k in (getattr(base, name) for name in _EVENT_STEPS) if 0 < k < n_total))
+    window = int(np.ceil(opts.event_window / cfg.dt))
+    tol = {'f': opts.tol_f, 'p': opts.tol_p, 'pu': opts.tol_pu}
+    stepper = _Stepper(cfg, base, opts.segment, opts.fixed)
+    ss_limits = steady_rates(cfg, opts)
+    thresholds = [getattr(base, a) for a in _DF_THRESHOLDS]
+
+    s = EngineState(cfg)
+    pieces = {name: [] for name in ['k'] + SIGNALS}
+    K, n, h_prev = 0, n_max, cfg.dt
+    quiet_since, terminated, rejected, model_steps = None, False, 0, 0
+
+    while K < n_total:
+        next_event = next((e for e in events if e > K), n_total)
+        df = abs(s.f_bawu - cfg.F0)
+        near = any(e <= K < e + window for e in events) or any(abs(df - x) < opts.switch_band for x in thresholds)
+        n_try = 1 if near else n
+        while True:
+            m = min(opts.segment, (next_event - K) // n_try)
+            if n_try == 1 or m < 3:
+                n_try, m, err = 1, min(opts.fixed, next_event - K), 0.0
+                break
+            new, out = stepper.run(s, K, n_try, m, h_prev)
+            model_steps += m
+            err = _segment_error(out, m, n_try, tol)
+            if err > 1.0:
+                n_try, n, rejected = n_try // 2, n_try // 2, rejected + 1
+                continue
+            if _crossed(s, new, out, m, base):
+                # A threshold of a discrete decision was crossed: redo this span with cfg.dt
+                n_try, m, err, rejected = 1, min(n_try * m, opts.fixed), 0.0, rejected + 1
+            break
+        if n_try == 1:
+            new, out = stepper.run(s, K, 1, m, h_prev)
+            model_steps += m
+
+        pieces['k'].append(K + n_try * np.arange(m))
+        for name in SIGNALS:
+            pieces[name].append(out[name][:m].copy())
+        K_prev, K, h_prev = K, K + n_try * m, n_try * cfg.dt
+        rates = [(getattr(new, a) - getattr(s, a)) / ((K - K_prev) * cfg.dt) for a in _MONITORED]
+        s = new
+        if err < 0.25:
+            n = min(n_max, 2 * max(n, n_try))
+
+        # Steady state: all activations passed and every monitored rate below its limit for ss_hold seconds
+        if opts.ss_hold is not None and (not events or K >= events[-1] + window):
+            quiet = abs(s.f_bawu - cfg.F0) <= cfg.restore_tol_hz and all(
+                abs(r) <= limit for r, limit in zip(rates, ss_limits))
+            quiet_since = (quiet_since if quiet_since is not None else K_prev) if quiet else None
+            if quiet_since is not None and (K - quiet_since) * cfg.dt >= opts.ss_hold:
+                terminated = True
+                break
+
+    # Final sample (same padding as result_dict)
+    k = np.concatenate(pieces['k'] + [[K]]).astype(np.intp)
+    res = {name: np.append(np.concatenate(pieces[name]), pieces[name][-1][-1]) for name in SIGNALS}
+    res['f_bawu'][-1], res['f_fr'][-1] = s.f_bawu, s.f_fr
+    t = k * axis.step
+    if K == n_total:
+        t[-1] = axis.T
+    res.update({'t': t, 'soc_min': base.soc_min, 'soc_max': base.soc_max, 'cfg': cfg, 't_end': float(t[-1]),
+                'terminated_early': terminated, 'n_steps': len(t) - 1, 'n_rejected': rejected,
+                'n_model_steps': model_steps})
+    return res
+
+
+def resample(res: dict, t_uniform: np.ndarray = None) -> dict:
+    """Interpolates an adaptive result onto a uniform grid (default: the fixed-step axis of cfg).
+    Beyond t_end (early steady-state termination) the final values are held."""
+    cfg = res['cfg']
+    if t_uniform is None:
+        t_uniform = np.linspace(0, cfg.T, n_steps_for(cfg))
+    out = {name: np.interp(t_uniform, res['t'], res[name]) for name in SIGNALS}
+    out.update({'t': t_uniform, 'soc_min': res['soc_min'], 'soc_max': res['soc_max'], 'cfg': cfg})
+    return out
+
+
+def error_report(res: dict, reference: dict = None) -> dict:
+    """Error of an adaptive run against the fixed-step reference (simulate_fast) in frequency, nadir and time to recovery."""
+    cfg = res['cfg']
+    reference = reference or simulate_fast(cfg)
+    uniform = resample(res, reference['t'])
+    k_ad, k_ref = kpi_values(res), kpi_values(reference)
+    ttr_err = None
+    if k_ad['ttr_s'] is not None and k_ref['ttr_s'] is not None:
+        ttr_err = k_ad['ttr_s'] - k_ref['ttr_s']
+    err_f = uniform['f_bawu'] - reference['f_bawu']
+    return {
+        'steps': res['n_steps'], 'steps_fixed': len(reference['t']) - 1,
+        'step_reduction': (len(reference['t']) - 1) / max(res['n_steps'], 1),
+        't_end': res['t_end'], 'terminated_early': res['terminated_early'],
+        'max_abs_err_f_hz': float(np.max(np.abs(err_f))),
+        'rms_err_f_hz': float(np.sqrt(np.mean(err_f ** 2))),
+        'nadir_err_hz': k_ad['nadir_hz'] - k_ref['nadir_hz'],
+        't_nadir_err_s': k_ad['t_nadir_s'] - k_ref['t_nadir_s'],
+        'ttr_err_s': ttr_err,
+        'recovered': (k_ad['ttr_s'] is not None, k_ref['ttr_s'] is not None),
+    }
+
+
+def check_accuracy(cfg: SimulationConfig, opts: AdaptiveOptions = None, tol_hz: float = ACCURACY_TOL_HZ) -> dict:
+    """error_report() of simulate_adaptive(cfg); raises ValueError if the frequency error exceeds tol_hz."""
+    report = error_report(simulate_adaptive(cfg, opts))
+    if report['max_abs_err_f_hz'] > tol_hz:
+        raise ValueError(f"Adaptive run deviates by {report['max_abs_err_f_hz'] * 1e3:.3f} mHz from the "
+                         f"fixed-step run (limit {tol_hz * 1e3:.3f} mHz).")
+    return report
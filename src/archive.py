@@ -0,0 +1,218 @@
+import json
+import os
+from collections.abc import Mapping
+
+import numpy as np
+from src.sim_config import SimulationConfig
+from src.engine import SIGNALS, EngineConstants, TimeAxis
+from src.cache import normalized_config
+from src.kpi import accumulate, default_accumulators, collect_kpis
+from src.recording import Recorder, iter_chunks
+
+# -------------------- Ergebnis-Archiv (spaltenweise, memory-mapped) --------------------
+# Layout of an archive directory:
+#   meta.json          time axis (T, dt, n_steps), signal names and dtype
+#   runs.jsonl         one line per run: {'run', 'params' (full SimulationConfig), 'kpis'}
+#   <signal>.bin       raw array of shape (n_runs, n_steps), one row per run, appended in place
+# A run counts once its runs.jsonl line is written (signal rows first), so an interrupted append
+# leaves no half-written run behind. All runs of an archive share one time axis.
+
+def config_from_params(params: dict) -> SimulationConfig:
+    """SimulationConfig with every attribute taken from a stored parameter dict."""
+    cfg = SimulationConfig()
+    cfg.__dict__.update(params)
+    return cfg
+
+
+class ResultArchive:
+    """
+    On-disk archive of many runs. Signals are read lazily through memory maps, so selecting
+    single signals, runs or time windows never loads the rest of the archive.
+    """
+    def __init__(self, path: str, signals=None, dtype=np.float64):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as fh:
+                self.meta = json.load(fh)
+        else:
+            names = list(signals) if signals is not None else list(SIGNALS)
+            unknown = set(names) - set(SIGNALS)
+            if unknown:
+                raise ValueError(f"Unknown signals: {sorted(unknown)}. Available: {SIGNALS}")
+            self.meta = {'signals': names, 'dtype': np.dtype(dtype).str, 'T': None, 'dt': None, 'n_steps': None}
+        self.signals, self.dtype = self.meta['signals'], np.dtype(self.meta['dtype'])
+        self.runs = []
+        runs_path = os.path.join(path, 'runs.jsonl')
+        if os.path.exists(runs_path):
+            with open(runs_path, encoding='utf-8') as fh:
+                self.runs = [json.loads(line) for line in fh if line.strip()]
+        self._maps = {}
+        self._truncate_partial_rows()
+
+    def __len__(self):
+        return len(self.runs)
+
+    # ---- Schreiben ----
+    def _signal_path(self, name: str) -> str:
+        return os.path.join(self.path, f'{name}.bin')
+
+    def _row_bytes(self) -> int:
+        return self.meta['n_steps'] * self.dtype.itemsize
+
+    def _truncate_partial_rows(self):
+        """Drops signal data of a run whose append was interrupted before its runs.jsonl line."""
+        if self.meta['n_steps'] is None:
+            return
+        size = len(self.runs) * self._row_bytes()
+        for name in self.signals:
+            p = self._signal_path(name)
+            if os.path.exists(p) and os.path.getsize(p) > size:
+                with open(p, 'r+b') as fh:
+                    fh.truncate(size)
+
+    def _check_axis(self, cfg: SimulationConfig):
+        n_steps = TimeAxis(cfg).n_steps
+        if self.meta['n_steps'] is None:
+            self.meta.update({'T': cfg.T, 'dt': cfg.dt, 'n_steps': n_steps})
+            with open(os.path.join(self.path, 'meta.json'), 'w', encoding='utf-8') as fh:
+                json.dump(self.meta, fh, indent=1)
+        elif (cfg.T, cfg.dt, n_steps) != (self.meta['T'], self.meta['dt'], self.meta['n_steps']):
+            raise ValueError(f"Run with T={cfg.T}, dt={cfg.dt} does not fit the archive time axis "
+                             f"(T={self.meta['T']}, dt={self.meta['dt']}).")
+
+    def _commit(self, cfg: SimulationConfig, kpis: dict) -> int:
+        entry = {'run': len(self.runs), 'params': normalized_config(cfg), 'kpis': kpis}
+        with open(os.path.join(self.path, 'runs.jsonl'), 'a', encoding='utf-8') as fh:
+            fh.write(json.dumps(entry, default=repr) + '\n')
+        self.runs.append(entry)
+        self._maps.clear()
+        return entry['run']
+
+    def append(self, res: dict, kpis: dict = None) -> int:
+        """Appends a finished result dict (simulate() layout); kpis default to the online KPIs. Returns the run index."""
+        cfg = res['cfg']
+        self._check_axis(cfg)
+        for name in self.signals:
+            x = np.asarray(res[name], dtype=self.dtype)
+            if len(x) != self.meta['n_steps']:
+                raise ValueError(f"Signal '{name}' has {len(x)} samples, the archive expects {self.meta['n_steps']}.")
+            with open(self._signal_path(name), 'ab') as fh:
+                fh.write(x.tobytes())
+        return self._commit(cfg, kpis if kpis is not None else accumulate(res))
+
+    def append_record(self, rec: dict) -> int:
+        """Appends a run_sweep() record (its signals must cover the archive signals)."""
+        return self.append({**rec['signals'], 'cfg': SimulationConfig(**rec['params'])}, rec['kpis'])
+
+    def add_run(self, cfg: SimulationConfig, chunk_samples: int = 4096) -> int:
+        """Simulates cfg and streams it chunk by chunk into the archive (memory independent of T)."""
+        self._check_axis(cfg)
+        accumulators = default_accumulators()
+        recorder = Recorder(self.signals, dtype=self.dtype, chunk_samples=chunk_samples)
+        handles = {name: open(self._signal_path(name), 'ab') for name in self.signals}
+        try:
+            for chunk in iter_chunks(cfg, recorder, accumulators):
+                for name, fh in handles.items():
+                    fh.write(chunk[name].tobytes())
+        finally:
+            for fh in handles.values():
+                fh.close()
+        return self._commit(cfg, collect_kpis(accumulators, cfg))
+
+    # ---- Lesen ----
+    def signal(self, name: str) -> np.ndarray:
+        """Read-only memory map of one signal with shape (n_runs, n_steps)."""
+        if name not in self.signals:
+            raise KeyError(f"Signal '{name}' is not archived. Archived: {self.signals}")
+        if name not in self._maps:
+            self._maps[name] = np.memmap(self._signal_path(name), dtype=self.dtype, mode='r',
+                                         shape=(len(self.runs), self.meta['n_steps']))
+        return self._maps[name]
+
+    def steps(self, t0: float = None, t1: float = None):
+        """Step range [k0, k1) of the time window [t0, t1]."""
+        axis = self.time_axis()
+        k0 = 0 if t0 is None else axis.first(lambda t: t >= t0)
+        k1 = axis.n_steps if t1 is None else axis.first(lambda t: t > t1)
+        return k0, k1
+
+    def time_axis(self) -> TimeAxis:
+        if self.meta['n_steps'] is None:
+            raise ValueError("The archive is empty.")
+        return TimeAxis(config_from_params(self.runs[0]['params']))
+
+    def window(self, name: str, runs=None, t0: float = None, t1: float = None) -> np.ndarray:
+        """One signal for the selected runs (default all) in the time window [t0, t1]."""
+        k0, k1 = self.steps(t0, t1)
+        data = self.signal(name)
+        return data[:, k0:k1] if runs is None else data[runs, k0:k1]
+
+    def query(self, **conditions) -> list:
+        """
+        Run indices whose parameters or KPIs match all conditions. A condition is a value (equality),
+        a (lo, hi) tuple (inclusive, None = open) or a predicate, e.g.
+        query(bess_mode='off', P_loss=(2e9, None), nadir_hz=lambda f: f < 49.2).
+        """
+        def match(value, cond):
+            if value is None:
+                return cond is None
+            if callable(cond):
+                return bool(cond(value))
+            if isinstance(cond, tuple):
+                lo, hi = cond
+                return (lo is None or value >= lo) and (hi is None or value <= hi)
+            return value == cond
+
+        hits = []
+        for entry in self.runs:
+            fields = {**entry['params'], **entry['kpis']}
+            if all(key in fields and match(fields[key], cond) for key, cond in conditions.items()):
+                hits.append(entry['run'])
+        return hits
+
+    def run(self, i: int, t0: float = None, t1: float = None) -> 'ArchivedRun':
+        return ArchivedRun(self, i, t0, t1)
+
+    def __iter__(self):
+        return (self.run(i) for i in range(len(self.runs)))
+
+
+class ArchivedRun(Mapping):
+    """
+    One archived run with the keys of a simulate() result ('t', the signals, 'cfg', 'soc_min',
+    'soc_max') plus 'params' and 'kpis'. Signals are memory-map views loaded on access and
+    limited to the time window [t0, t1], so plot_results/compute_kpis work on it directly.
+    """
+    def __init__(self, archive: ResultArchive, i: int, t0: float = None, t1: float = None):
+        if not 0 <= i < len(archive):
+            raise IndexError(f"Run {i} is not in the archive ({len(archive)} runs).")
+        self.archive, self.index = archive, i
+        self.k0, self.k1 = archive.steps(t0, t1)
+        entry = archive.runs[i]
+        cfg = config_from_params(entry['params'])
+        c = EngineConstants(cfg)
+        self._static = {'cfg': cfg, 'params': entry['params'], 'kpis': entry['kpis'],
+                        'soc_min': c.soc_min, 'soc_max': c.soc_max}
+
+    def __getitem__(self, key):
+        if key in self._static:
+            return self._static[key]
+        if key == 't':
+            return self.archive.time_axis().values(self.k0, self.k1)
+        if key in self.archive.signals:
+            return np.asarray(self.archive.signal(key)[self.index, self.k0:self.k1])
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(['t', *self.archive.signals, *self._static])
+
+    def __len__(self):
+        return 1 + len(self.archive.signals) + len(self._static)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
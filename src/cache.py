@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+
+import numpy as np
+from src.sim_config import SimulationConfig
+from src.engine import EngineConstants, EngineState, TimeAxis, allocate_outputs, advance, result_dict
+
+# -------------------- Ergebnis-Cache & Zustands-Checkpoints --------------------
+# Milestones at which the engine state is snapshotted, keyed by the EngineConstants step index
+MILESTONES = {
+    'fault': 'k_fault', 'bess_active': 'k_bess', 'psh_active': 'k_f', 'gud1_active': 'k_g1',
+    'gud2_active': 'k_g2', 'assist_end': 'k_assist', 'mfrr_window': 'k_mfrr',
+}
+
+# First milestone at which a parameter can influence the trajectory. Before the fault the system is
+# at rest (Δf = 0, all powers 0), so most parameters only act from the fault on. Parameters that are
+# not listed (F0, t_fault, T, dt, ...) force a run from t=0.
+PARAM_FIRST_USE = {
+    **dict.fromkeys(['P_loss', 'T12', 'H_sys', 'D_sys', 'S_base', 'H_sys_fr', 'D_sys_fr', 'S_base_fr',
+                     'k_p_max', 'f_p_max', 'gud1_p_max', 'gud2_p_max', 'B_bias', 'fcr_bw_max', 'fcr_fr_max',
+                     'fcr_full_activation_df', 'fcr_tau', 'bess_k_damp', 'bess_k_rocof', 'bess_deadband',
+                     'bess_headroom', 'bess_E_MWh', 'bess_eff', 'df_close_hz', 'bess_trim_cap', 'bess_mode'], 'fault'),
+    **dict.fromkeys(['k_delay', 'k_ramp', 'bess_ramp_out_mw_per_sec'], 'bess_active'),
+    **dict.fromkeys(['f_delay', 'f_ramp'], 'psh_active'),
+    **dict.fromkeys(['gud1_delay', 'gud1_ramp'], 'gud1_active'),
+    **dict.fromkeys(['gud2_delay', 'gud2_ramp'], 'gud2_active'),
+    **dict.fromkeys(['bess_min_assist_sec', 'df_trim_in', 'share_trim_max'], 'assist_end'),
+    **dict.fromkeys(['mfrr_delay', 'mfrr_p_max', 'mfrr_ramp', 'restore_tol_hz', 'lambda_rise', 'lambda_fall',
+                     'ace_thresh', 'util_thresh', 'tau_ace', 'tau_util'], 'mfrr_window'),
+}
+
+
+def normalized_config(cfg: SimulationConfig) -> dict:
+    """Full SimulationConfig attribute set with numbers normalized to float (3000 and 3000.0 hash alike)."""
+    return {name: (float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value)
+            for name, value in sorted(vars(cfg).items())}
+
+
+def config_key(cfg: SimulationConfig) -> str:
+    """Content hash of the normalized configuration."""
+    payload = json.dumps(normalized_config(cfg), sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def result_nbytes(res: dict) -> int:
+    return sum(v.nbytes for v in res.values() if isinstance(v, np.ndarray))
+
+
+def resume_step(parent: SimulationConfig, child: SimulationConfig) -> int:
+    """Last step up to which the trajectories of both configs are provably identical (0 if none)."""
+    a, b = normalized_config(parent), normalized_config(child)
+    if a.keys() != b.keys():
+        return 0
+    changed = [name for name in a if a[name] != b[name]]
+    if any(name not in PARAM_FIRST_USE for name in changed):
+        return 0
+    c_a, c_b = EngineConstants(parent), EngineConstants(child)
+    steps = [min(getattr(c_a, MILESTONES[PARAM_FIRST_USE[name]]), getattr(c_b, MILESTONES[PARAM_FIRST_USE[name]]))
+             for name in changed]
+    return min(steps, default=TimeAxis(child).n_steps - 1)
+
+
+def simulate_with_checkpoints(cfg: SimulationConfig, resume: tuple = None):
+    """
+    Runs the engine and snapshots the full EngineState at every milestone.
+    resume = (parent_result, checkpoint) continues from a parent's snapshot instead of t=0.
+    Returns (result, checkpoints) with checkpoints = {milestone: (k, EngineState)}.
+    """
+    axis = TimeAxis(cfg)
+    n_steps = axis.n_steps
+    c = EngineConstants(cfg, axis)
+    out = allocate_outputs(n_steps)
+    checkpoints = {}
+    if resume is None:
+        s = EngineState(cfg)
+    else:
+        parent, (name, k0, snapshot) = resume
+        s = snapshot.copy()
+        for key, arr in out.items():
+            arr[:k0] = parent[key][:k0]
+        checkpoints[name] = (k0, snapshot)
+    stops = sorted((getattr(c, attr), name) for name, attr in MILESTONES.items())
+    for k_stop, name in stops:
+        if s.k <= k_stop < n_steps - 1:
+            advance(s, c, out, k_stop)
+            checkpoints.setdefault(name, (k_stop, s.copy()))
+    advance(s, c, out, n_steps - 1)
+    return result_dict(s, c, out, axis.values(), cfg), checkpoints
+
+
+class ResultCache:
+    """
+    Two-tier memo cache for simulation results: an in-memory LRU bounded by `max_bytes` and an
+    optional on-disk tier (`disk_dir`). Entries also keep the milestone checkpoints of their run,
+    so a config that only differs in later-acting parameters resumes from a snapshot.
+    """
+    def __init__(self, max_bytes: int = 256 * 2**20, disk_dir: str = None):
+        self.max_bytes, self.disk_dir = max_bytes, disk_dir
+        self._entries = OrderedDict()  # key -> (result, checkpoints, nbytes)
+        self.nbytes = 0
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'resumed': 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f'{key}.pkl')
+
+    def _insert(self, key: str, res: dict, checkpoints: dict):
+        # Cached traces are shared by every hit, so they are frozen (callers get read-only views)
+        for value in res.values():
+            if isinstance(value, np.ndarray):
+                value.setflags(write=False)
+        nbytes = result_nbytes(res)
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[2]
+        self._entries[key] = (res, checkpoints, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            self.nbytes -= self._entries.popitem(last=False)[1][2]
+
+    def get(self, cfg: SimulationConfig):
+        """Cached (result, checkpoints) for cfg or None."""
+        key = config_key(cfg)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            res, checkpoints, _ = self._entries[key]
+            return res, checkpoints
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            with open(self._disk_path(key), 'rb') as fh:
+                res, checkpoints = pickle.load(fh)
+            res['cfg'] = cfg
+            self._insert(key, res, checkpoints)
+            self.stats['disk_hits'] += 1
+            return res, checkpoints
+        return None
+
+    def put(self, cfg: SimulationConfig, res: dict, checkpoints: dict = None):
+        key = config_key(cfg)
+        self._insert(key, res, checkpoints or {})
+        if self.disk_dir:
+            tmp = self._disk_path(key) + '.tmp'
+            with open(tmp, 'wb') as fh:
+                pickle.dump((res, checkpoints or {}), fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._disk_path(key))
+
+    def best_checkpoint(self, cfg: SimulationConfig):
+        """(parent_result, (milestone, k, state)) with the latest snapshot that is valid for cfg, or None."""
+        best = None
+        for res, checkpoints, _ in self._entries.values():
+            if not checkpoints or res['cfg'].T != cfg.T or res['cfg'].dt != cfg.dt:
+                continue
+            k_max = resume_step(res['cfg'], cfg)
+            for name, (k, state) in checkpoints.items():
+                if 0 < k <= k_max and (best is None or k > best[1][1]):
+                    best = (res, (name, k, state))
+        return best
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+
+DEFAULT_CACHE = ResultCache()
+
+
+def read_only(res: dict) -> dict:
+    """Shallow copy of a result whose arrays are read-only views (in-place edits raise ValueError)."""
+    out = {}
+    for key, value in res.items():
+        if isinstance(value, np.ndarray):
+            value = value.view()
+            value.setflags(write=False)
+        out[key] = value
+    return out
+
+
+def cached_simulate(cfg: SimulationConfig, cache: ResultCache = None) -> dict:
+    """
+    simulate_fast() with memoization: exact hits are returned directly, near misses resume from a checkpoint.
+    The arrays are read-only views of the cached run; copy them (np.array(res['f_bawu'])) to modify.
+    """
+    cache = cache or DEFAULT_CACHE
+    hit = cache.get(cfg)
+    if hit is not None:
+        return read_only(hit[0])
+    cache.stats['misses'] += 1
+    resume = cache.best_checkpoint(cfg)
+    if resume is not None:
+        cache.stats['resumed'] += 1
+    res, checkpoints = simulate_with_checkpoints(cfg, resume)
+    cache.put(cfg, res, checkpoints)
+    return read_only(res)
@@ -0,0 +1,150 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+from src.sim_config import SimulationConfig
+from src.engine import TimeAxis
+
+# -------------------- Störgrößen (Zeitreihen, Kontingenzen, Rauschen) --------------------
+# A disturbance source delivers the per-area power deficit ΔP [W] (positive = missing generation,
+# same sign as cfg.P_loss) block by block: block(k0, k1) returns shape (k1 - k0, n_areas) for the
+# steps k0..k1-1. Blocks are requested in order, so sources never hold more than one block in
+# RAM. Everything is added on top of the cfg.P_loss step (set P_loss=0 for profile-only runs;
+# note that the mFRR volume is still scheduled from cfg.P_loss).
+
+class Disturbance(ABC):
+    def start(self, cfg: SimulationConfig, n_areas: int = 2):
+        """Resets the source for a new run (seeded sources restart their stream)."""
+        self.cfg, self.n_areas, self.axis = cfg, n_areas, TimeAxis(cfg)
+
+    @abstractmethod
+    def block(self, k0: int, k1: int) -> np.ndarray:
+        ...
+
+    def _check_area(self, area: int):
+        if not 0 <= area < self.n_areas:
+            raise ValueError(f"Area {area} does not exist (n_areas={self.n_areas}).")
+
+
+class Contingencies(Disturbance):
+    """Sequence of trips [(t, dP, area), ...], e.g. a second unit tripping while mFRR still ramps."""
+    def __init__(self, events):
+        self.events = [(float(t), float(dP), int(area)) for t, dP, area in events]
+
+    def start(self, cfg, n_areas=2):
+        super().start(cfg, n_areas)
+        for _, _, area in self.events:
+            self._check_area(area)
+
+    def block(self, k0, k1):
+        t = self.axis.values(k0, k1)
+        out = np.zeros((k1 - k0, self.n_areas))
+        for t_event, dP, area in self.events:
+            out[:, area] += np.where(t >= t_event, dP, 0.0)
+        return out
+
+
+class Profile(Disturbance):
+    """
+    Measured imbalance profile from a memory-mapped file (.npy via np.load(mmap_mode='r'), any other
+    path as raw float64) or an array. 1-D profiles act on `area`, 2-D profiles (samples, areas) on all
+    areas. Sample j is at t_start + j * dt (default cfg.dt, then no interpolation is needed); outside
+    the profile ΔP is 0. Only the samples of the current block are read from disk.
+    """
+    def __init__(self, source, area: int = 0, dt: float = None, t_start: float = 0.0, scale: float = 1.0):
+        self.source, self.area, self.dt, self.t_start, self.scale = source, area, dt, t_start, scale
+        self.data = None
+
+    def start(self, cfg, n_areas=2):
+        super().start(cfg, n_areas)
+        if self.data is None:
+            if isinstance(self.source, str):
+                self.data = (np.load(self.source, mmap_mode='r') if self.source.endswith('.npy')
+                             else np.memmap(self.source, dtype=np.float64, mode='r'))
+            else:
+                self.data = np.asarray(self.source)
+        if self.data.ndim == 1:
+            self._check_area(self.area)
+        elif self.data.shape[1] != n_areas:
+            raise ValueError(f"Profile has {self.data.shape[1]} area columns, the model has {n_areas}.")
+
+    def _samples(self, j0: int, j1: int) -> np.ndarray:
+        """Profile samples j0..j1-1 (zeros outside the profile) as a 2-D (samples, columns) array."""
+        data = self.data if self.data.ndim == 2 else self.data[:, None]
+        out = np.zeros((j1 - j0, data.shape[1]))
+        lo, hi = max(j0, 0), min(j1, len(data))
+        if lo < hi:
+            out[lo - j0:hi - j0] = data[lo:hi]
+        return out
+
+    def block(self, k0, k1):
+        dt = self.dt or self.cfg.dt
+        if dt == self.cfg.dt and self.t_start == 0.0:
+            values = self._samples(k0, k1)
+        else:
+            u = (self.axis.values(k0, k1) - self.t_start) / dt
+            j0, j1 = int(np.floor(u[0])), int(np.floor(u[-1])) + 2
+            raw = self._samples(j0, j1)
+            xp = np.arange(j0, j1)
+            values = np.column_stack([np.interp(u, xp, raw[:, col], left=0.0, right=0.0) for col in range(raw.shape[1])])
+        values = values * self.scale
+        if self.data.ndim == 2:
+            return values
+        out = np.zeros((k1 - k0, self.n_areas))
+        out[:, self.area] = values[:, 0]
+        return out
+
+
+class Noise(Disturbance):
+    """
+    Seeded stochastic load/renewable noise: an Ornstein-Uhlenbeck process with stationary standard
+    deviation sigma [W] and correlation time tau [s] (tau=None: white noise). The stream is generated
+    block by block and is identical for any block size; the same seed gives the same stream.
+    """
+    def __init__(self, sigma: float, tau: float = None, seed=None, area: int = 0):
+        self.sigma, self.tau, self.seed, self.area = sigma, tau, seed, area
+
+    def start(self, cfg, n_areas=2):
+        super().start(cfg, n_areas)
+        self._check_area(self.area)
+        self.rng = np.random.default_rng(self.seed)
+        self.a = np.exp(-cfg.dt / self.tau) if self.tau else 0.0
+        self.b = self.sigma * np.sqrt(1.0 - self.a ** 2)
+        self.x = self.sigma * self.rng.standard_normal() if self.tau else 0.0
+
+    def block(self, k0, k1):
+        w = self.rng.standard_normal(k1 - k0)
+        out = np.zeros((k1 - k0, self.n_areas))
+        if not self.tau:
+            out[:, self.area] = self.sigma * w
+            return out
+        col, a, b, x = out[:, self.area], self.a, self.b, self.x
+        for j, wj in enumerate(w.tolist()):
+            col[j] = x
+            x = a * x + b * wj
+        self.x = x
+        return out
+
+
+class Combined(Disturbance):
+    """Sum of several sources."""
+    def __init__(self, sources):
+        self.sources = list(sources)
+
+    def start(self, cfg, n_areas=2):
+        super().start(cfg, n_areas)
+        for src in self.sources:
+            src.start(cfg, n_areas)
+
+    def block(self, k0, k1):
+        out = np.zeros((k1 - k0, self.n_areas))
+        for src in self.sources:
+            out += src.block(k0, k1)
+        return out
+
+
+def as_disturbance(disturbance, cfg: SimulationConfig, n_areas: int = 2) -> Disturbance:
+    """Accepts one source or a list of sources and starts it for a run of cfg."""
+    if isinstance(disturbance, (list, tuple)):
+        disturbance = Combined(disturbance)
+    disturbance.start(cfg, n_areas)
+    return disturbance
@@ -0,0 +1,279 @@
+import numpy as np
+from src.sim_config import SimulationConfig
+from src.afrr_mfrr import AGC_Controller
+
+# -------------------- Fast Single-Run Engine --------------------
+# Same discrete model as simulation.simulate(), but the controller state lives in a
+# __slots__ object, the hot loop only touches native floats and every per-config
+# constant (droop gains, ramp limits per dt, activation step indices) is computed once.
+
+SIGNALS = [
+    'f_bawu', 'f_fr', 'P_k', 'P_f', 'P_g1', 'P_g2', 'P_mfrr', 'P_tie',
+    'P_fcr_bw', 'P_fcr_fr', 'P_total', 'bess_share_history', 'SoC'
+]
+BESS_MODES = {'afrr_and_damping': 0, 'off': 1}  # every other mode runs the experimental 'coupled' branch
+
+
+def n_steps_for(cfg: SimulationConfig) -> int:
+    """Number of samples of a run, identical to simulate()."""
+    return int(np.ceil(cfg.T / cfg.dt)) + 1
+
+
+class TimeAxis:
+    """
+    The time axis np.linspace(0, cfg.T, n_steps) of a run, evaluated lazily: sample k is k * step
+    (the last one exactly T), so long runs never need the full array in memory.
+    """
+    def __init__(self, cfg: SimulationConfig):
+        self.n_steps = n_steps_for(cfg)
+        self.T = cfg.T
+        self.step = cfg.T / (self.n_steps - 1) if self.n_steps > 1 else 0.0
+
+    def at(self, k: int) -> float:
+        return float(self.T) if k == self.n_steps - 1 else k * self.step
+
+    def values(self, k0: int = 0, k1: int = None) -> np.ndarray:
+        """Samples k0..k1-1, bit-identical to the corresponding slice of np.linspace."""
+        k1 = self.n_steps if k1 is None else k1
+        t = np.arange(k0, k1, dtype=float) * self.step
+        if k1 == self.n_steps and k1 > k0:
+            t[-1] = self.T
+        return t
+
+    def first(self, condition) -> int:
+        """First step whose time satisfies a time-monotone condition (n_steps if it never holds)."""
+        lo, hi = 0, self.n_steps
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if condition(self.at(mid)): hi = mid
+            else: lo = mid + 1
+        return lo
+
+
+class EngineConstants:
+    """Per-config constants of the hot loop, precomputed once with the exact float expressions of the step functions."""
+    __slots__ = (
+        'F0', 'dt', 'P_loss', 'T12', 'a_bw', 'two_H_bw', 'D_bw', 'S_bw', 'a_fr', 'two_H_fr', 'D_fr', 'S_fr',
+        'neg_kdroop_bw', 'neg_kdroop_fr', 'fcr_bw_max', 'fcr_fr_max', 'fcr_gain',
+        'Ki', 'B_bias', 'agc_max_dis', 'agc_max_chg', 'total_afrr_cap',
+        'restore_tol_hz', 'ace_thresh', 'util_thresh', 'lambda_up', 'lambda_down', 'mfrr_volume', 'mfrr_step',
+        'df_trim_in', 'share_trim_max', 'slow_limit', 'share_down', 'share_up',
+        'bess_deadband', 'neg_k_damp', 'k_rocof', 'k_p_max', 'neg_k_p_max', 'df_close_hz', 'bess_trim_cap', 'mode',
+        'soc_min', 'soc_max', 'soc_half_band', 'k_ramp_up', 'k_ramp_down', 'dt_h', 'E_dis', 'E_chg',
+        'f_p_max', 'f_step', 'g1_p_max', 'g1_step', 'g2_p_max', 'g2_step',
+        'k_fault', 'k_bess', 'k_f', 'k_g1', 'k_g2', 'k_assist', 'k_mfrr',
+    )
+
+    def __init__(self, cfg: SimulationConfig, axis: TimeAxis = None):
+        axis = axis or TimeAxis(cfg)
+        self.F0, self.dt, self.P_loss, self.T12 = cfg.F0, cfg.dt, cfg.P_loss, cfg.T12
+        # Swing equations
+        self.a_bw, self.two_H_bw, self.D_bw, self.S_bw = cfg.F0 / (2 * cfg.H_sys), 2 * cfg.H_sys, cfg.D_sys, cfg.S_base
+        self.a_fr, self.two_H_fr, self.D_fr, self.S_fr = cfg.F0 / (2 * cfg.H_sys_fr), 2 * cfg.H_sys_fr, cfg.D_sys_fr, cfg.S_base_fr
+        # FCR
+        self.neg_kdroop_bw = -(cfg.fcr_bw_max / cfg.fcr_full_activation_df)
+        self.neg_kdroop_fr = -(cfg.fcr_fr_max / cfg.fcr_full_activation_df)
+        self.fcr_bw_max, self.fcr_fr_max = cfg.fcr_bw_max, cfg.fcr_fr_max
+        self.fcr_gain = cfg.dt / cfg.fcr_tau
+        # AGC and λ handover
+        self.total_afrr_cap = cfg.k_p_max + cfg.f_p_max + cfg.gud1_p_max + cfg.gud2_p_max
+        agc = AGC_Controller(cfg.dt, self.total_afrr_cap, cfg.k_p_max, cfg.B_bias)
+        self.Ki, self.B_bias, self.agc_max_dis, self.agc_max_chg = agc.Ki, agc.B_bias, agc.P_max_discharge, agc.P_max_charge
+        self.restore_tol_hz, self.ace_thresh, self.util_thresh = cfg.restore_tol_hz, cfg.ace_thresh, cfg.util_thresh
+        self.lambda_up, self.lambda_down = cfg.lambda_rise * cfg.dt, cfg.lambda_fall * cfg.dt
+        self.mfrr_volume, self.mfrr_step = min(cfg.P_loss, cfg.mfrr_p_max), cfg.mfrr_ramp * cfg.dt
+        # BESS
+        self.df_trim_in, self.share_trim_max, self.slow_limit = cfg.df_trim_in, cfg.share_trim_max, 3 * cfg.k_p_max
+        self.share_down, self.share_up = (1/30.0) * cfg.dt, (1/120.0) * cfg.dt
+        self.bess_deadband, self.neg_k_damp, self.k_rocof = cfg.bess_deadband, -cfg.bess_k_damp, cfg.bess_k_rocof
+        self.k_p_max, self.neg_k_p_max = cfg.k_p_max, -cfg.k_p_max
+        self.df_close_hz, self.bess_trim_cap = cfg.df_close_hz, cfg.bess_trim_cap
+        self.mode = BESS_MODES.get(cfg.bess_mode, 2)
+        self.soc_min, self.soc_max = 0.5 - cfg.bess_headroom / 2, 0.5 + cfg.bess_headroom / 2
+        self.soc_half_band = cfg.bess_headroom/2 + 1e-9
+        self.k_ramp_up, self.k_ramp_down = cfg.k_ramp * cfg.dt, -cfg.bess_ramp_out_mw_per_sec * 1e6 * cfg.dt
+        self.dt_h = cfg.dt / 3600.0
+        self.E_dis, self.E_chg = cfg.bess_E_MWh * cfg.bess_eff, cfg.bess_E_MWh * (1 / cfg.bess_eff)
+        # Conventional aFRR (merit order)
+        self.f_p_max, self.f_step = cfg.f_p_max, cfg.f_ramp * cfg.dt
+        self.g1_p_max, self.g1_step = cfg.gud1_p_max, cfg.gud1_ramp * cfg.dt
+        self.g2_p_max, self.g2_step = cfg.gud2_p_max, cfg.gud2_ramp * cfg.dt
+        # Activation step indices (same comparisons as the step functions, evaluated on the time axis)
+        self.k_fault = axis.first(lambda t: t >= cfg.t_fault)
+        self.k_bess = axis.first(lambda t: t >= cfg.t_fault + cfg.k_delay)
+        self.k_f = axis.first(lambda t: t >= cfg.t_fault + cfg.f_delay)
+        self.k_g1 = axis.first(lambda t: t >= cfg.t_fault + cfg.gud1_delay)
+        self.k_g2 = axis.first(lambda t: t >= cfg.t_fault + cfg.gud2_delay)
+        self.k_assist = axis.first(lambda t: (t - cfg.t_fault) >= cfg.bess_min_assist_sec)
+        self.k_mfrr = axis.first(lambda t: t - cfg.t_fault >= cfg.mfrr_delay)
+
+
+class EngineState:
+    """Scalar controller state at the start of step k (all values native floats)."""
+    __slots__ = (
+        'k', 'f_bawu', 'f_fr', 'soc', 'prev_df', 'p_k', 'P_k', 'p_f', 'p_g1', 'p_g2', 'p_mfrr',
+        'p_fcr_bw', 'p_fcr_fr', 'integral_term', 'lambda_share', 'bess_share',
+    )
+
+    def __init__(self, cfg: SimulationConfig):
+        self.k = 0
+        self.f_bawu, self.f_fr, self.soc = float(cfg.F0), float(cfg.F0), 0.50
+        self.prev_df = self.p_k = self.P_k = self.p_f = self.p_g1 = self.p_g2 = self.p_mfrr = 0.0
+        self.p_fcr_bw = self.p_fcr_fr = self.integral_term = self.lambda_share = 0.0
+        self.bess_share = 1.0
+
+    def copy(self) -> 'EngineState':
+        other = EngineState.__new__(EngineState)
+        for name in EngineState.__slots__:
+            setattr(other, name, getattr(self, name))
+        return other
+
+
+def allocate_outputs(n: int) -> dict:
+    """Preallocated history arrays for n samples."""
+    return {name: np.zeros(n) for name in SIGNALS}
+
+
+def advance(s: EngineState, c: EngineConstants, out: dict, k_stop: int, offset: int = 0, disturbance=None):
+    """
+    Advances the state from step s.k up to (excluding) k_stop. Each step k writes its samples to
+    out[...][k - offset]; frequencies and SoC are recorded as the values at the start of step k.
+    disturbance = (dP_bw, dP_fr) adds per-step power deficits [W] (indexed like out) on top of the
+    cfg.P_loss step; None leaves the run bit-identical to simulate().
+    """
+    # Output buffers
+    o_fb, o_ff, o_soc, o_tie = out['f_bawu'], out['f_fr'], out['SoC'], out['P_tie']
+    o_fcr_bw, o_fcr_fr, o_k, o_f = out['P_fcr_bw'], out['P_fcr_fr'], out['P_k'], out['P_f']
+    o_g1, o_g2, o_m, o_tot, o_share = out['P_g1'], out['P_g2'], out['P_mfrr'], out['P_total'], out['bess_share_history']
+    # Constants
+    F0, dt, P_loss, T12 = c.F0, c.dt, c.P_loss, c.T12
+    a_bw, two_H_bw, D_bw, S_bw = c.a_bw, c.two_H_bw, c.D_bw, c.S_bw
+    a_fr, two_H_fr, D_fr, S_fr = c.a_fr, c.two_H_fr, c.D_fr, c.S_fr
+    neg_kdroop_bw, neg_kdroop_fr, fcr_bw_max, fcr_fr_max, fcr_gain = c.neg_kdroop_bw, c.neg_kdroop_fr, c.fcr_bw_max, c.fcr_fr_max, c.fcr_gain
+    Ki, B_bias, agc_max_dis, agc_max_chg, total_afrr_cap = c.Ki, c.B_bias, c.agc_max_dis, c.agc_max_chg, c.total_afrr_cap
+    restore_tol_hz, ace_thresh, util_thresh = c.restore_tol_hz, c.ace_thresh, c.util_thresh
+    lambda_up, lambda_down, mfrr_volume, mfrr_step = c.lambda_up, c.lambda_down, c.mfrr_volume, c.mfrr_step
+    df_trim_in, share_trim_max, slow_limit, share_down, share_up = c.df_trim_in, c.share_trim_max, c.slow_limit, c.share_down, c.share_up
+    bess_deadband, neg_k_damp, k_rocof, k_p_max, neg_k_p_max = c.bess_deadband, c.neg_k_damp, c.k_rocof, c.k_p_max, c.neg_k_p_max
+    df_close_hz, bess_trim_cap, mode = c.df_close_hz, c.bess_trim_cap, c.mode
+    soc_min, soc_max, soc_half_band, k_ramp_up, k_ramp_down = c.soc_min, c.soc_max, c.soc_half_band, c.k_ramp_up, c.k_ramp_down
+    dt_h, E_dis, E_chg = c.dt_h, c.E_dis, c.E_chg
+    f_p_max, f_step, g1_p_max, g1_step, g2_p_max, g2_step = c.f_p_max, c.f_step, c.g1_p_max, c.g1_step, c.g2_p_max, c.g2_step
+    k_fault, k_bess, k_f, k_g1, k_g2, k_assist, k_mfrr = c.k_fault, c.k_bess, c.k_f, c.k_g1, c.k_g2, c.k_assist, c.k_mfrr
+    dist_bw, dist_fr = disturbance if disturbance is not None else (None, None)
+    # State
+    f_bw, f_fr, soc, prev_df = s.f_bawu, s.f_fr, s.soc, s.prev_df
+    p_k, P_k, p_f, p_g1, p_g2, p_mfrr = s.p_k, s.P_k, s.p_f, s.p_g1, s.p_g2, s.p_mfrr
+    p_fcr_bw, p_fcr_fr, integral, lam, share = s.p_fcr_bw, s.p_fcr_fr, s.integral_term, s.lambda_share, s.bess_share
+
+    for k in range(s.k, k_stop):
+        i = k - offset
+        o_fb[i] = f_bw; o_ff[i] = f_fr; o_soc[i] = soc
+        # 1. Grid state
+        deltaP = P_loss if k >= k_fault else 0.0
+        if dist_bw is not None: deltaP += dist_bw[i]
+        df = f_bw - F0
+        df_fr = f_fr - F0
+        rocof = (df - prev_df) / dt
+        prev_df = df
+        P_tie = T12 * (df - df_fr)
+        # 2. FCR
+        x = neg_kdroop_bw * df
+        p_fcr_bw += fcr_gain * ((-fcr_bw_max if x < -fcr_bw_max else (fcr_bw_max if x > fcr_bw_max else x)) - p_fcr_bw)
+        x = neg_kdroop_fr * df_fr
+        p_fcr_fr += fcr_gain * ((-fcr_fr_max if x < -fcr_fr_max else (fcr_fr_max if x > fcr_fr_max else x)) - p_fcr_fr)
+        # 3. AGC, λ handover, mFRR
+        integral += Ki * -(B_bias * df + P_tie) * dt
+        if integral < -agc_max_chg: integral = -agc_max_chg
+        elif integral > agc_max_dis: integral = agc_max_dis
+        p_afrr_raw = integral
+        slow = p_f + p_g1 + p_g2
+        if k >= k_mfrr and abs(df) <= restore_tol_hz and (abs(integral) > ace_thresh or abs(P_k + p_f + p_g1 + p_g2) / total_afrr_cap > util_thresh):
+            lam = min(1.0, lam + lambda_up)
+        else:
+            lam = max(0.0, lam - lambda_down)
+        p_afrr_req = (1.0 - lam) * p_afrr_raw
+        x = lam * mfrr_volume - p_mfrr
+        p_mfrr_prev = p_mfrr
+        p_mfrr += 0.0 if x < 0.0 else (mfrr_step if x > mfrr_step else x)
+        if k > 0:
+            integral -= (p_mfrr - p_mfrr_prev)
+        # 4. BESS
+        if k < k_assist: share_target = 1.0
+        elif abs(df) <= df_trim_in: share_target = share_trim_max
+        elif slow > slow_limit: share_target = 0.0
+        else: share_target = 1.0
+        if share_target < share: share = max(share_target, share - share_down)
+        elif share_target > share: share = min(share_target, share + share_up)
+        p_bess_damp = neg_k_damp * df - k_rocof * rocof if abs(df) > bess_deadband else 0.0
+        x = p_afrr_req
+        p_bess_afrr = (neg_k_p_max if x < neg_k_p_max else (k_p_max if x > k_p_max else x)) * share
+        if abs(df) <= df_close_hz:
+            p_bess_afrr = -bess_trim_cap if p_bess_afrr < -bess_trim_cap else (bess_trim_cap if p_bess_afrr > bess_trim_cap else p_bess_afrr)
+        if mode == 0: p_bess_cmd = p_bess_afrr + p_bess_damp
+        elif mode == 1: p_bess_cmd = 0.0
+        else: p_bess_cmd = p_bess_afrr + (p_bess_damp * share)
+        cap_chg = k_p_max * min(1.0, max(0.0, soc_max - soc) / soc_half_band)
+        cap_dis = k_p_max * min(1.0, max(0.0, soc - soc_min) / soc_half_band)
+        neg_cap_chg = -cap_chg
+        p_bess_cmd = neg_cap_chg if p_bess_cmd < neg_cap_chg else (cap_dis if p_bess_cmd > cap_dis else p_bess_cmd)
+        x = (p_bess_cmd if k >= k_bess else 0.0) - p_k
+        p_k += k_ramp_down if x < k_ramp_down else (k_ramp_up if x > k_ramp_up else x)
+        P_k = neg_cap_chg if p_k < neg_cap_chg else (cap_dis if p_k > cap_dis else p_k)
+        dE = (P_k / 1e6) * dt_h
+        soc = soc - dE / (E_dis if dE >= 0 else E_chg)
+        soc = soc_min if soc < soc_min else (soc_max if soc > soc_max else soc)
+        # 5. Conventional aFRR dispatch (PSH -> GuD 1 -> GuD 2)
+        rem_pos = max(0.0, p_afrr_req - P_k)
+        x = (min(rem_pos, f_p_max) if k >= k_f else 0.0) - p_f
+        p_f += -f_step if x < -f_step else (f_step if x > f_step else x)
+        rem_pos -= p_f
+        x = (min(rem_pos, g1_p_max) if k >= k_g1 else 0.0) - p_g1
+        p_g1 += -g1_step if x < -g1_step else (g1_step if x > g1_step else x)
+        rem_pos -= p_g1
+        x = (min(rem_pos, g2_p_max) if k >= k_g2 else 0.0) - p_g2
+        p_g2 += -g2_step if x < -g2_step else (g2_step if x > g2_step else x)
+        # 6. Swing equations
+        P_total = P_k + p_f + p_g1 + p_g2 + p_mfrr
+        P_net_bawu = -deltaP + P_total + p_fcr_bw - P_tie
+        f_bw = f_bw + ((a_bw * (P_net_bawu / S_bw)) - (D_bw * df) / two_H_bw) * dt
+        P_net_fr = P_tie + p_fcr_fr
+        if dist_fr is not None: P_net_fr -= dist_fr[i]
+        f_fr = f_fr + ((a_fr * (P_net_fr / S_fr)) - (D_fr * df_fr) / two_H_fr) * dt
+        # Recording
+        o_tie[i] = P_tie; o_fcr_bw[i] = p_fcr_bw; o_fcr_fr[i] = p_fcr_fr; o_m[i] = p_mfrr
+        o_share[i] = share; o_k[i] = P_k; o_f[i] = p_f; o_g1[i] = p_g1; o_g2[i] = p_g2; o_tot[i] = P_total
+
+    s.k = max(s.k, k_stop)
+    s.f_bawu, s.f_fr, s.soc, s.prev_df = f_bw, f_fr, soc, prev_df
+    s.p_k, s.P_k, s.p_f, s.p_g1, s.p_g2, s.p_mfrr = p_k, P_k, p_f, p_g1, p_g2, p_mfrr
+    s.p_fcr_bw, s.p_fcr_fr, s.integral_term, s.lambda_share, s.bess_share = p_fcr_bw, p_fcr_fr, integral, lam, share
+
+
+def result_dict(s: EngineState, c: EngineConstants, out: dict, t: np.ndarray, cfg: SimulationConfig) -> dict:
+    """Packs a finished run into the result layout of simulate(), including finalize_arrays padding."""
+    out['f_bawu'][-1], out['f_fr'][-1] = s.f_bawu, s.f_fr
+    for key in SIGNALS[2:]:
+        out[key][-1] = out[key][-2]
+    res = {'t': t, **out,
+           'p_k': s.p_k, 'p_f': s.p_f, 'p_g1': s.p_g1, 'p_g2': s.p_g2, 'p_mfrr': s.p_mfrr,
+           'p_fcr_bw_state': s.p_fcr_bw, 'p_fcr_fr_state': s.p_fcr_fr,
+           'prev_df': s.prev_df, 'lambda_share': s.lambda_share, 'bess_share': s.bess_share,
+           'soc_min': c.soc_min, 'soc_max': c.soc_max, 'cfg': cfg}
+    return res
+
+
+def simulate_fast(cfg: SimulationConfig, disturbance=None) -> dict:
+    """Drop-in replacement for simulate(): same result dict, bit-for-bit identical arrays.
+    disturbance: optional Disturbance source(s) from disturbance.py, added to the cfg.P_loss step."""
+    axis = TimeAxis(cfg)
+    c = EngineConstants(cfg, axis)
+    s = EngineState(cfg)
+    out = allocate_outputs(axis.n_steps)
+    dist = None
+    if disturbance is not None:
+        from src.disturbance import as_disturbance
+        dP = as_disturbance(disturbance, cfg).block(0, axis.n_steps - 1)
+        dist = (np.ascontiguousarray(dP[:, 0]), np.ascontiguousarray(dP[:, 1]))
+    advance(s, c, out, axis.n_steps - 1, disturbance=dist)
+    return result_dict(s, c, out, axis.values(), cfg)
@@ -0,0 +1,183 @@
+import numpy as np
+from src.afrr_mfrr import AGC_Controller
+from src.engine import SIGNALS, BESS_MODES, n_steps_for
+
+# -------------------- Ensemble (N Szenarien, ein Zeitschritt-Loop) --------------------
+
+def stack_config_params(cfgs: list) -> dict:
+    """Collects every numeric SimulationConfig attribute into an (N,) array, one entry per scenario."""
+    params = {}
+    for name, value in vars(cfgs[0]).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            params[name] = np.array([getattr(cfg, name) for cfg in cfgs], dtype=float)
+    params['bess_mode'] = np.array([BESS_MODES.get(cfg.bess_mode, 2) for cfg in cfgs])
+    return params
+
+
+def initialize_ensemble_state(cfgs: list, n_steps: int) -> dict:
+    """Batched counterpart of helpers.initialize_state: every history array gains a leading scenario axis (N, n_steps)."""
+    n = len(cfgs)
+    p = stack_config_params(cfgs)
+    state = {name: np.zeros((n, n_steps)) for name in SIGNALS}
+    state['t'] = np.linspace(0, cfgs[0].T, n_steps)
+    state['f_bawu'][:] = p['F0'][:, None]
+    state['f_fr'][:] = p['F0'][:, None]
+    # Per-scenario controller states, shape (N,)
+    for key in ['p_k', 'p_f', 'p_g1', 'p_g2', 'p_mfrr', 'p_fcr_bw_state', 'p_fcr_fr_state', 'prev_df', 'lambda_share']:
+        state[key] = np.zeros(n)
+    state['bess_share'] = np.ones(n)
+    state['SoC'][:, 0] = 0.50
+    state['soc_min'] = 0.5 - p['bess_headroom'] / 2
+    state['soc_max'] = 0.5 + p['bess_headroom'] / 2
+    return state
+
+
+def update_fcr_power_batch(state: dict, k: int, df: np.ndarray, df_fr: np.ndarray, p: dict):
+    """Vectorized update_fcr_power over all scenarios."""
+    kdroop_bw = p['fcr_bw_max'] / p['fcr_full_activation_df']
+    kdroop_fr = p['fcr_fr_max'] / p['fcr_full_activation_df']
+    p_fcr_bw_target = np.clip(-kdroop_bw * df, -p['fcr_bw_max'], p['fcr_bw_max'])
+    state['p_fcr_bw_state'] += (p['dt'] / p['fcr_tau']) * (p_fcr_bw_target - state['p_fcr_bw_state'])
+    state['P_fcr_bw'][:, k] = state['p_fcr_bw_state']
+    p_fcr_fr_target = np.clip(-kdroop_fr * df_fr, -p['fcr_fr_max'], p['fcr_fr_max'])
+    state['p_fcr_fr_state'] += (p['dt'] / p['fcr_tau']) * (p_fcr_fr_target - state['p_fcr_fr_state'])
+    state['P_fcr_fr'][:, k] = state['p_fcr_fr_state']
+
+
+def update_afrr_mfrr_logic_batch(state: dict, k: int, df: np.ndarray, P_tie_k: np.ndarray, agc: AGC_Controller, total_afrr_cap: np.ndarray, p: dict):
+    """Vectorized update_afrr_mfrr_logic: AGC integrator, λ handover and bumpless mFRR ramp for all scenarios."""
+    p_afrr_raw = agc.step(df, P_tie_k)
+    if k > 0:
+        P_afrr_now = state['P_k'][:, k-1] + state['P_f'][:, k-1] + state['P_g1'][:, k-1] + state['P_g2'][:, k-1]
+    else:
+        P_afrr_now = np.zeros_like(df)
+    freq_stable = np.abs(df) <= p['restore_tol_hz']
+    is_sustained = (np.abs(agc.integral_term) > p['ace_thresh']) | (np.abs(P_afrr_now) / total_afrr_cap > p['util_thresh'])
+    rising = freq_stable & is_sustained & (state['t'][k] - p['t_fault'] >= p['mfrr_delay'])
+    state['lambda_share'] = np.where(rising,
+                                     np.minimum(1.0, state['lambda_share'] + p['lambda_rise'] * p['dt']),
+                                     np.maximum(0.0, state['lambda_share'] - p['lambda_fall'] * p['dt']))
+    p_afrr_req = (1.0 - state['lambda_share']) * p_afrr_raw
+    p_mfrr_target = state['lambda_share'] * np.minimum(p['P_loss'], p['mfrr_p_max'])
+    p_mfrr_change = np.clip(p_mfrr_target - state['p_mfrr'], 0.0, p['mfrr_ramp'] * p['dt'])
+    state['p_mfrr'] += p_mfrr_change
+    state['P_mfrr'][:, k] = state['p_mfrr']
+    if k > 0:
+        agc.integral_term -= (state['P_mfrr'][:, k] - state['P_mfrr'][:, k-1])
+    return p_afrr_req
+
+
+def update_bess_power_and_soc_batch(state: dict, k: int, df: np.ndarray, rocof: np.ndarray, p_afrr_req: np.ndarray, p: dict):
+    """Vectorized update_bess_power_and_soc: share ramp, damping, mode selection, SoC caps and asymmetric ramps."""
+    t_k = state['t'][k]
+    if k > 0:
+        power_slow_sources = state['P_f'][:, k-1] + state['P_g1'][:, k-1] + state['P_g2'][:, k-1]
+    else:
+        power_slow_sources = np.zeros_like(df)
+    share_target = np.where((t_k - p['t_fault']) < p['bess_min_assist_sec'], 1.0,
+                   np.where(np.abs(df) <= p['df_trim_in'], p['share_trim_max'],
+                   np.where(power_slow_sources > (3 * p['k_p_max']), 0.0, 1.0)))
+    share = state['bess_share']
+    share = np.where(share_target < share, np.maximum(share_target, share - (1/30.0)*p['dt']),
+            np.where(share_target > share, np.minimum(share_target, share + (1/120.0)*p['dt']), share))
+    state['bess_share'] = share
+    state['bess_share_history'][:, k] = share
+    # BESS power command components
+    p_bess_damp = np.where(np.abs(df) > p['bess_deadband'], -p['bess_k_damp'] * df - p['bess_k_rocof'] * rocof, 0.0)
+    p_bess_afrr = np.clip(p_afrr_req, -p['k_p_max'], p['k_p_max']) * share
+    p_bess_afrr = np.where(np.abs(df) <= p['df_close_hz'], np.clip(p_bess_afrr, -p['bess_trim_cap'], p['bess_trim_cap']), p_bess_afrr)
+    mode = p['bess_mode']
+    p_bess_cmd = np.where(mode == 0, p_bess_afrr + p_bess_damp,
+                 np.where(mode == 1, 0.0, p_bess_afrr + (p_bess_damp * share)))
+    # SoC constraints
+    soc = state['SoC'][:, k]
+    soc_margin_up = np.maximum(0.0, state['soc_max'] - soc)
+    soc_margin_dn = np.maximum(0.0, soc - state['soc_min'])
+    cap_chg = p['k_p_max'] * np.minimum(1.0, soc_margin_up / (p['bess_headroom']/2 + 1e-9))
+    cap_dis = p['k_p_max'] * np.minimum(1.0, soc_margin_dn / (p['bess_headroom']/2 + 1e-9))
+    p_bess_cmd = np.clip(p_bess_cmd, -cap_chg, cap_dis)
+    # Asymmetric ramp rates
+    p_k_target = np.where(t_k >= p['t_fault'] + p['k_delay'], p_bess_cmd, 0.0)
+    ramp_up_limit = p['k_ramp'] * p['dt']
+    ramp_down_limit = -p['bess_ramp_out_mw_per_sec'] * 1e6 * p['dt']
+    power_change = p_k_target - state['p_k']
+    state['p_k'] += np.clip(power_change, ramp_down_limit, ramp_up_limit)
+    state['P_k'][:, k] = np.clip(state['p_k'], -cap_chg, cap_dis)
+    # SoC for the next step
+    dE = (state['P_k'][:, k] / 1e6) * (p['dt'] / 3600.0)
+    efficiency = np.where(dE >= 0, p['bess_eff'], 1 / p['bess_eff'])
+    soc_next = state['SoC'][:, k] - dE / (p['bess_E_MWh'] * efficiency)
+    state['SoC'][:, k+1] = np.clip(soc_next, state['soc_min'], state['soc_max'])
+
+
+def dispatch_conventional_afrr_batch(state: dict, k: int, p_afrr_req: np.ndarray, p: dict):
+    """Vectorized merit-order dispatch of the remaining aFRR request to PSH, GuD 1 and GuD 2."""
+    t_k = state['t'][k]
+    rem_pos = np.maximum(0.0, p_afrr_req - state['P_k'][:, k])
+    for p_key, arr_key, unit in (('p_f', 'P_f', 'f'), ('p_g1', 'P_g1', 'gud1'), ('p_g2', 'P_g2', 'gud2')):
+        target = np.where(t_k >= p['t_fault'] + p[f'{unit}_delay'], np.minimum(rem_pos, p[f'{unit}_p_max']), 0.0)
+        ramp = p[f'{unit}_ramp'] * p['dt']
+        state[p_key] += np.clip(target - state[p_key], -ramp, ramp)
+        state[arr_key][:, k] = state[p_key]
+        rem_pos = rem_pos - state[p_key]
+
+
+def update_grid_frequencies_batch(state: dict, k: int, deltaP: np.ndarray, df: np.ndarray, df_fr: np.ndarray, p: dict):
+    """Vectorized swing equations of both areas for all scenarios."""
+    state['P_total'][:, k] = state['P_k'][:, k] + state['P_f'][:, k] + state['P_g1'][:, k] + state['P_g2'][:, k] + state['P_mfrr'][:, k]
+    P_net_bawu = -deltaP + state['P_total'][:, k] + state['P_fcr_bw'][:, k] - state['P_tie'][:, k]
+    dfdt_bawu = (p['F0'] / (2 * p['H_sys'])) * (P_net_bawu / p['S_base']) - (p['D_sys'] * df) / (2 * p['H_sys'])
+    state['f_bawu'][:, k+1] = state['f_bawu'][:, k] + dfdt_bawu * p['dt']
+    P_net_fr = state['P_tie'][:, k] + state['P_fcr_fr'][:, k]
+    dfdt_fr = (p['F0'] / (2 * p['H_sys_fr'])) * (P_net_fr / p['S_base_fr']) - (p['D_sys_fr'] * df_fr) / (2 * p['H_sys_fr'])
+    state['f_fr'][:, k+1] = state['f_fr'][:, k] + dfdt_fr * p['dt']
+
+
+def simulate_ensemble(cfgs: list) -> dict:
+    """
+    Runs N scenarios in one batched time loop. All configurations must share T and dt;
+    every other SimulationConfig attribute (P_loss, T12, k_p_max, bess_mode, ...) may differ per scenario.
+    Each history array in the result has shape (N, n_steps); row i matches simulate(cfgs[i]).
+    """
+    if not cfgs:
+        raise ValueError("simulate_ensemble needs at least one SimulationConfig.")
+    if any(cfg.T != cfgs[0].T or cfg.dt != cfgs[0].dt for cfg in cfgs):
+        raise ValueError("All scenarios of an ensemble must share the same T and dt.")
+    n_steps = n_steps_for(cfgs[0])
+    state = initialize_ensemble_state(cfgs, n_steps)
+    p = stack_config_params(cfgs)
+
+    total_afrr_cap = p['k_p_max'] + p['f_p_max'] + p['gud1_p_max'] + p['gud2_p_max']
+    agc = AGC_Controller(p['dt'], total_afrr_cap, p['k_p_max'], p['B_bias'])
+    agc.integral_term = np.zeros(len(cfgs))
+
+    for k in range(n_steps - 1):
+        # 1. Grid state of every scenario
+        t_k = state['t'][k]
+        deltaP = np.where(t_k >= p['t_fault'], p['P_loss'], 0.0)
+        df = state['f_bawu'][:, k] - p['F0']
+        df_fr = state['f_fr'][:, k] - p['F0']
+        rocof = (df - state['prev_df']) / p['dt']
+        state['prev_df'] = df
+        state['P_tie'][:, k] = p['T12'] * (df - df_fr)
+        # 2.-6. Controller stages, vectorized over the scenario axis
+        update_fcr_power_batch(state, k, df, df_fr, p)
+        p_afrr_req = update_afrr_mfrr_logic_batch(state, k, df, state['P_tie'][:, k], agc, total_afrr_cap, p)
+        update_bess_power_and_soc_batch(state, k, df, rocof, p_afrr_req, p)
+        dispatch_conventional_afrr_batch(state, k, p_afrr_req, p)
+        update_grid_frequencies_batch(state, k, deltaP, df, df_fr, p)
+
+    # Same end-of-run padding as helpers.finalize_arrays
+    for key in SIGNALS:
+        if key not in ('f_bawu', 'f_fr'):
+            state[key][:, -1] = state[key][:, -2]
+    return {**state, 'cfgs': cfgs}
+
+
+def select_scenario(res: dict, i: int) -> dict:
+    """Extracts scenario i from an ensemble result in the single-run layout expected by plot_results/compute_kpis."""
+    r = {key: res[key][i] for key in SIGNALS}
+    r['t'] = res['t']
+    r['soc_min'], r['soc_max'] = float(res['soc_min'][i]), float(res['soc_max'][i])
+    r['cfg'] = res['cfgs'][i]
+    return r
@@ -0,0 +1,288 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# -------------------- Schnelle Plots (dezimiert, In-Place-Updates) --------------------
+# Traces are reduced to about two points per pixel column before drawing. 'minmax' keeps the
+# minimum and maximum of every column (the nadir and all other peaks survive exactly), 'lttb'
+# (Largest-Triangle-Three-Buckets) keeps the visually most significant point per bucket.
+DECIMATION_METHODS = ('minmax', 'lttb')
+
+
+def minmax_indices(y: np.ndarray, n_bins: int) -> np.ndarray:
+    """Sorted indices of the first, the last and the min/max sample of each of n_bins equal bins."""
+    n = len(y)
+    if n <= 2 * n_bins + 2:
+        return np.arange(n)
+    size = -(-n // n_bins)
+    padded = np.concatenate((y, np.full(size * n_bins - n, y[-1])))
+    bins = padded.reshape(n_bins, size)
+    offsets = np.arange(n_bins) * size
+    idx = np.concatenate(([0, n - 1], offsets + bins.argmin(axis=1), offsets + bins.argmax(axis=1)))
+    return np.unique(np.minimum(idx, n - 1))
+
+
+def lttb_indices(t: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: n_out indices including the first and the last sample."""
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        t_avg, y_avg = t[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        area = np.abs((t[a] - t_avg) * (y[lo:hi] - y[a]) - (t[a] - t[lo:hi]) * (y_avg - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+def decimate_indices(t: np.ndarray, ys, max_points: int, method: str = 'minmax') -> np.ndarray:
+    """Common indices for one or several traces on the same time axis (union over the traces)."""
+    if method not in DECIMATION_METHODS:
+        raise ValueError(f"method must be one of {DECIMATION_METHODS}, not '{method}'.")
+    if method == 'minmax':
+        parts = [minmax_indices(y, max(1, max_points // 2)) for y in ys]
+    else:
+        parts = [lttb_indices(t, y, max_points) for y in ys]
+    return parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+
+
+def decimate(t: np.ndarray, y: np.ndarray, max_points: int = 2000, method: str = 'minmax'):
+    """(t, y) reduced to about max_points samples."""
+    idx = decimate_indices(t, [y], max_points, method)
+    return t[idx], y[idx]
+
+
+def _panel_data(r, plot_end_time=None) -> dict:
+    """The cropped traces of plot_results in plot units (MW, %)."""
+    t_full = r['t']
+    end_idx = np.searchsorted(t_full, plot_end_time, side='right') if plot_end_time else len(t_full)
+    t = t_full[:end_idx]
+    d = {'t': t, 'f_bawu': r['f_bawu'][:end_idx], 'f_fr': r['f_fr'][:end_idx]}
+    for key, name in (('P_k', 'P_k'), ('P_f', 'P_f'), ('P_g1', 'P_g1'), ('P_g2', 'P_g2'), ('P_m', 'P_mfrr'),
+                      ('P_tot', 'P_total'), ('P_tie', 'P_tie'), ('P_fcr_bw', 'P_fcr_bw'), ('P_fcr_fr', 'P_fcr_fr')):
+        d[key] = r[name][:end_idx] / 1e6
+    d['SoC'] = 100 * r['SoC'][:end_idx]
+    d['bess_share'] = 100 * r['bess_share_history'][:end_idx]
+    d['P_fcr_sum'] = d['P_fcr_bw'] + d['P_fcr_fr']
+    d['P_slow'] = d['P_f'] + d['P_g1'] + d['P_g2']
+    d['P_import'] = -d['P_tie']
+    d['P_loss'] = np.zeros_like(t)
+    d['P_loss'][np.searchsorted(t, r['cfg'].t_fault, side='left'):] = r['cfg'].P_loss / 1e6
+    return d
+
+
+# Panel layout of plot_results: (title, lines [(key, label, style)], stack [(key, label)])
+PANELS = [
+    ('Frequenzverläufe ', [('f_bawu', 'Frequenz BaWü', {}), ('f_fr', 'Frequenz Kuppelnetz', {'linestyle': '--'})], []),
+    ('Leistungsbilanz (Deckung des Ausfalls)', [('P_loss', 'Leistungsverlust', {'color': 'k', 'linestyle': '--', 'lw': 2})],
+     [('P_fcr_bw', 'FCR (BaWü)'), ('P_tot', 'Regelleistung (aFRR+mFRR)'), ('P_import', 'Import via Kuppel')]),
+    ('Leistungen der aFRR/mFRR-Quellen', [('P_k', 'BESS (Gesamt)', {'color': 'red', 'lw': 2}),
+                                          ('P_tot', 'Summe Regelleistung', {'color': 'k', 'linestyle': '--'})],
+     [('P_f', 'PSH'), ('P_g1', 'GuD 1'), ('P_g2', 'GuD 2'), ('P_m', 'mFRR')]),
+    ('Primärregelung (FCR)', [('P_fcr_bw', 'FCR BaWü', {}), ('P_fcr_fr', 'FCR FR', {'linestyle': '--'}),
+                              ('P_fcr_sum', 'FCR Summe', {'lw': 2})], []),
+    ('BESS SoC', [('SoC', 'SoC', {})], []),
+    ('BESS aFRR-Anteil', [('bess_share', 'aFRR-Anteil', {'color': 'purple'})], []),
+    ('Regler-Ebenen (Summe)', [], [('P_fcr_sum', 'FCR'), ('P_k', 'BESS'), ('P_slow', 'aFRR (langsam)'), ('P_m', 'mFRR')]),
+]
+
+
+def _stack_verts(t, layers):
+    """Polygon vertices of the stacked layers (as stackplot: cumulative sums from 0)."""
+    verts, lower = [], np.zeros_like(t)
+    for y in layers:
+        upper = lower + y
+        verts.append(np.column_stack((np.concatenate((t, t[::-1])), np.concatenate((upper, lower[::-1])))))
+        lower = upper
+    return verts
+
+
+class FastPlot:
+    """
+    The panels of plot_results on one reusable Agg figure. The first update() builds the artists,
+    later calls only replace their data (decimated to about two points per pixel column).
+    Works without a display: save() writes a PNG, show() displays the figure in a notebook.
+    """
+    def __init__(self, figsize=(14, 30), dpi: int = 100, method: str = 'minmax', max_points: int = None):
+        self.figsize, self.dpi, self.method = figsize, dpi, method
+        self.max_points = max_points or int(2 * figsize[0] * dpi)
+        self.fig = None
+
+    def _build(self):
+        fig = Figure(figsize=self.figsize, dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        axs = fig.subplots(7, 1, sharex=True)
+        self.axs, self.lines, self.stacks, self.hlines = axs, [], [], {}
+        for ax, (title, lines, stack) in zip(axs, PANELS):
+            ax.set_title(title)
+            polys = [ax.fill(np.zeros(3), np.zeros(3), alpha=0.7, label=label, color=f'C{i}')[0] for i, (_, label) in enumerate(stack)]
+            arts = [ax.plot([], [], label=label, **style)[0] for _, label, style in lines]
+            self.stacks.append(polys)
+            self.lines.append(arts)
+            ax.grid(True)
+            ax.set_ylabel('Leistung [MW]')
+        self.hlines['f0'] = axs[0].axhline(50, c='k', ls=':')
+        self.hlines['soc_min'] = axs[4].axhline(0, ls=':', c='r')
+        self.hlines['soc_max'] = axs[4].axhline(100, ls=':', c='r')
+        axs[1].legend(loc='lower right')
+        for ax in axs[[0, 2, 3, 4, 5, 6]]:
+            ax.legend()
+        axs[0].set_ylabel('Frequenz [Hz]'); axs[4].set_ylabel('SoC [%]'); axs[5].set_ylabel('Anteil [%]')
+        axs[-1].set_xlabel('Zeit [s]')
+        axs[5].set_ylim(-5, 105)
+        fig.tight_layout()
+        self.fig = fig
+
+    def update(self, r, title_suffix: str = '', plot_end_time: float = None) -> Figure:
+        """Redraws the figure for result r (same arguments as plot_results)."""
+        if self.fig is None:
+            self._build()
+        d = _panel_data(r, plot_end_time)
+        t = d['t']
+        self.hlines['soc_min'].set_ydata([100 * r['soc_min']] * 2)
+        self.hlines['soc_max'].set_ydata([100 * r['soc_max']] * 2)
+        self.axs[0].set_title(PANELS[0][0] + title_suffix)
+        for i, (ax, (_, lines, stack)) in enumerate(zip(self.axs, PANELS)):
+            ys = []
+            if stack:
+                layers = [d[key] for key, _ in stack]
+                idx = decimate_indices(t, layers, self.max_points, self.method)
+                for poly, verts in zip(self.stacks[i], _stack_verts(t[idx], [y[idx] for y in layers])):
+                    poly.set_xy(verts)
+                    ys.append(verts[:, 1])
+            for line, (key, _, _) in zip(self.lines[i], lines):
+                idx = decimate_indices(t, [d[key]], self.max_points, self.method)
+                line.set_data(t[idx], d[key][idx])
+                ys.append(d[key][idx])
+            if i == 0:
+                ys.append([50.0])
+            elif i == 4:
+                ys.append([100 * r['soc_min'], 100 * r['soc_max']])
+            if i != 5 and ys:
+                lo, hi = min(np.min(y) for y in ys), max(np.max(y) for y in ys)
+                pad = 0.05 * (hi - lo) or 0.5
+                ax.set_ylim(lo - pad, hi + pad)
+        if len(t):
+            self.axs[0].set_xlim(t[0], t[-1])
+        return self.fig
+
+    def save(self, path: str):
+        """Writes the current figure as PNG."""
+        self.fig.savefig(path, format='png')
+
+    def show(self):
+        """Displays the current figure in a notebook output (e.g. inside an ipywidgets interact)."""
+        from IPython.display import display
+        display(self.fig)
+
+
+# Nadir support shares and ACE trace of analyze_and_report_facts
+SUPPORT_LABELS = ['Primärregelung (FCR)', 'Regelleistung (aFRR/mFRR)', 'Import via Kuppelleitung']
+SUPPORT_COLORS = ['#ff9999', '#66b3ff', '#99ff99']
+
+
+class FactsPlot:
+    """
+    The two figures of analyze_and_report_facts (support at the nadir as a pie, ACE trace) on reusable
+    Agg figures: the first update builds the artists, later calls move the wedges and replace the
+    (decimated) ACE data in place.
+    """
+    def __init__(self, ace_figsize=(14, 5), dpi: int = 100, method: str = 'minmax', max_points: int = None):
+        self.ace_figsize, self.dpi, self.method = ace_figsize, dpi, method
+        self.max_points = max_points or int(2 * ace_figsize[0] * dpi)
+        self.pie_fig = self.ace_fig = None
+
+    def _build_pie(self):
+        fig = Figure(dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        self.wedges, self.labels, self.pcts = ax.pie([1, 1, 1], labels=SUPPORT_LABELS, autopct='%1.1f%%', startangle=90,
+                                                     colors=SUPPORT_COLORS)
+        ax.axis('equal')
+        self.pie_ax, self.pie_fig = ax, fig
+
+    def _build_ace(self):
+        fig = Figure(figsize=self.ace_figsize, dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        self.ace_line = ax.plot([], [], label='ACE')[0]
+        self.ace_hi = ax.axhline(0, color='r', linestyle='--', label='mFRR Aktivierungsschwelle')
+        self.ace_lo = ax.axhline(0, color='r', linestyle='--')
+        ax.axhline(0, color='k', linestyle=':')
+        ax.set_title('Verlauf des Area Control Error (ACE)'); ax.set_xlabel('Zeit [s]'); ax.set_ylabel('ACE [MW]')
+        ax.grid(True); ax.legend()
+        self.ace_ax, self.ace_fig = ax, fig
+
+    def update_pie(self, sizes) -> Figure:
+        """Support at the nadir [W] in the order of SUPPORT_LABELS (same layout as plt.pie(startangle=90))."""
+        if self.pie_fig is None:
+            self._build_pie()
+        sizes = np.asarray(sizes, dtype=float)
+        fracs = sizes / sizes.sum()
+        theta = 90.0
+        for wedge, label, pct, frac in zip(self.wedges, self.labels, self.pcts, fracs):
+            wedge.set_theta1(theta)
+            wedge.set_theta2(theta + 360.0 * frac)
+            mid = np.deg2rad(theta + 180.0 * frac)
+            x, y = np.cos(mid), np.sin(mid)
+            label.set_position((1.1 * x, 1.1 * y))
+            label.set_horizontalalignment('left' if x > 0 else 'right')
+            pct.set_position((0.6 * x, 0.6 * y))
+            pct.set_text(f'{100 * frac:1.1f}%')
+            theta += 360.0 * frac
+        self.pie_ax.set_title(f"Leistungsbeitrag zur Stützung am Nadir ({sizes.sum() / 1e6:.0f} MW)")
+        return self.pie_fig
+
+    def update_ace(self, t: np.ndarray, ace_mw: np.ndarray, thresh_mw: float, plot_end_time: float = None) -> Figure:
+        if self.ace_fig is None:
+            self._build_ace()
+        idx = decimate_indices(t, [ace_mw], self.max_points, self.method)
+        self.ace_line.set_data(t[idx], ace_mw[idx])
+        self.ace_hi.set_ydata([thresh_mw] * 2)
+        self.ace_lo.set_ydata([-thresh_mw] * 2)
+        lo, hi = min(np.min(ace_mw), -thresh_mw), max(np.max(ace_mw), thresh_mw)
+        pad = 0.05 * (hi - lo) or 0.5
+        self.ace_ax.set_ylim(lo - pad, hi + pad)
+        self.ace_ax.set_xlim(0, plot_end_time or (t[-1] if len(t) else 1.0))
+        return self.ace_fig
+
+
+class PngRenderer:
+    """
+    Renders results to PNG files on background threads, e.g. inside a sweep loop. Every thread
+    keeps its own FastPlot, so figures are built once per thread and only updated afterwards.
+    """
+    def __init__(self, workers: int = 1, **plot_kwargs):
+        self.plot_kwargs = plot_kwargs
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+
+    def _render(self, r, path, title_suffix, plot_end_time):
+        plot = getattr(self._local, 'plot', None)
+        if plot is None:
+            plot = self._local.plot = FastPlot(**self.plot_kwargs)
+        plot.update(r, title_suffix, plot_end_time)
+        plot.save(path)
+        return path
+
+    def submit(self, r, path: str, title_suffix: str = '', plot_end_time: float = None):
+        """Queues one PNG; returns a Future with the path."""
+        return self._pool.submit(self._render, r, path, title_suffix, plot_end_time)
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
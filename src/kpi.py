@@ -0,0 +1,212 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+from src.engine import TimeAxis
+from src.recording import iter_blocks
+
+# -------------------- KPIs (numerisch) --------------------
+def kpi_values(r) -> dict:
+    """Numeric KPIs of a run (same definitions as plot.compute_kpis, without string formatting)."""
+    cfg = r['cfg']
+    f_bawu, t = r['f_bawu'], r['t']
+    nadir_idx = int(np.argmin(f_bawu))
+    recovered = np.where(np.abs(f_bawu[nadir_idx:] - cfg.F0) <= cfg.restore_tol_hz)[0]
+    t_recovery = float(t[nadir_idx + recovered[0]]) if len(recovered) else None
+    return {
+        'nadir_hz': float(f_bawu[nadir_idx]),
+        't_nadir_s': float(t[nadir_idx]),
+        't_recovery_s': t_recovery,
+        'ttr_s': t_recovery - cfg.t_fault if t_recovery is not None else None,
+        'max_import_mw': float(-np.min(r['P_tie'] / 1e6)),
+        # Künstliche Trägheit durch BESS (RoCoF-Komponente): H_bess = (K_RoCoF * F0) / (2 * S_base)
+        'h_bess_s': (cfg.bess_k_rocof * cfg.F0) / (2 * cfg.S_base),
+    }
+
+
+# -------------------- Online-KPIs (Akkumulatoren) --------------------
+# Accumulators see the run block by block (engine order, full resolution) and keep O(1) state,
+# so KPI-only runs never store time series. Every accumulator implements
+#   start(cfg)            - reset before a run
+#   update(block, t, k0)  - block: dict of signal arrays for steps k0..k0+len(t)-1
+#   result() -> dict      - KPIs in SI units as in kpi_values (MW/MWh where the key says so)
+
+class Accumulator(ABC):
+    def start(self, cfg):
+        self.cfg = cfg
+
+    @abstractmethod
+    def update(self, block: dict, t: np.ndarray, k0: int):
+        ...
+
+    @abstractmethod
+    def result(self) -> dict:
+        ...
+
+
+class NadirRecovery(Accumulator):
+    """Nadir of f_bawu, the reserve contributions at the nadir and the first recovery into restore_tol_hz after it."""
+    def start(self, cfg):
+        super().start(cfg)
+        self.nadir, self.t_nadir, self.t_recovery, self.at_nadir = np.inf, None, None, {}
+
+    def update(self, block, t, k0):
+        f = block['f_bawu']
+        j = int(np.argmin(f))
+        search_from = None
+        if f[j] < self.nadir:
+            self.nadir, self.t_nadir, self.t_recovery = float(f[j]), float(t[j]), None
+            self.at_nadir = {'p_fcr_at_nadir_mw': block['P_fcr_bw'][j] / 1e6, 'p_afrr_at_nadir_mw': block['P_total'][j] / 1e6,
+                             'p_import_at_nadir_mw': -block['P_tie'][j] / 1e6}
+            search_from = j
+        elif self.t_recovery is None:
+            search_from = 0
+        if search_from is not None:
+            hit = np.flatnonzero(np.abs(f[search_from:] - self.cfg.F0) <= self.cfg.restore_tol_hz)
+            if len(hit):
+                self.t_recovery = float(t[search_from + hit[0]])
+
+    def result(self):
+        return {'nadir_hz': self.nadir, 't_nadir_s': self.t_nadir, 't_recovery_s': self.t_recovery,
+                'ttr_s': self.t_recovery - self.cfg.t_fault if self.t_recovery is not None else None,
+                **{k: float(v) for k, v in self.at_nadir.items()}}
+
+
+class MaxImport(Accumulator):
+    def start(self, cfg):
+        super().start(cfg)
+        self.min_tie = np.inf
+
+    def update(self, block, t, k0):
+        self.min_tie = min(self.min_tie, float(np.min(block['P_tie'] / 1e6)))
+
+    def result(self):
+        return {'max_import_mw': -self.min_tie}
+
+
+class InitialRocof(Accumulator):
+    """RoCoF over the first second after the fault and the effective inertia H_eff derived from it (as in analyze_and_report_facts)."""
+    def start(self, cfg):
+        super().start(cfg)
+        axis = TimeAxis(cfg)
+        self.i0 = axis.first(lambda t: t > cfg.t_fault)
+        self.i1 = axis.first(lambda t: t > cfg.t_fault + 1.0)
+        self.samples = {}
+
+    def update(self, block, t, k0):
+        for i in (self.i0, self.i1):
+            if k0 <= i < k0 + len(t):
+                self.samples[i] = (float(t[i - k0]), float(block['f_bawu'][i - k0]))
+
+    def result(self):
+        if self.i1 <= self.i0 or len(self.samples) < 2:
+            return {'initial_rocof_hz_s': None, 'h_eff_s': None}
+        (t0, f0), (t1, f1) = self.samples[self.i0], self.samples[self.i1]
+        rocof = (f1 - f0) / (t1 - t0)
+        cfg = self.cfg
+        h_eff = - (cfg.P_loss * cfg.F0) / (2 * cfg.S_base * rocof) if rocof != 0 else float('inf')
+        return {'initial_rocof_hz_s': rocof, 'h_eff_s': h_eff}
+
+
+class PeakRocof(Accumulator):
+    """Largest |df/dt| between consecutive samples."""
+    def start(self, cfg):
+        super().start(cfg)
+        self.peak, self.last = 0.0, None
+
+    def update(self, block, t, k0):
+        f = block['f_bawu']
+        if self.last is not None:
+            f, t = np.concatenate(([self.last[1]], f)), np.concatenate(([self.last[0]], t))
+        if len(f) > 1:
+            self.peak = max(self.peak, float(np.max(np.abs(np.diff(f) / np.diff(t)))))
+        self.last = (t[-1], f[-1])
+
+    def result(self):
+        return {'peak_rocof_hz_s': self.peak}
+
+
+class AceStats(Accumulator):
+    """Integral, RMS and peak of the Area Control Error ACE = -(B·Δf + P_tie)."""
+    def start(self, cfg):
+        super().start(cfg)
+        self.sum = self.sum_sq = self.peak = 0.0
+        self.n = 0
+
+    def update(self, block, t, k0):
+        ace = -(self.cfg.B_bias * (block['f_bawu'] - self.cfg.F0) + block['P_tie'])
+        self.sum += float(np.sum(ace))
+        self.sum_sq += float(np.dot(ace, ace))
+        self.peak = max(self.peak, float(np.max(np.abs(ace))))
+        self.n += len(ace)
+
+    def result(self):
+        return {'ace_integral_mwh': self.sum * self.cfg.dt / 3600 / 1e6,
+                'ace_rms_mw': float(np.sqrt(self.sum_sq / self.n)) / 1e6 if self.n else None,
+                'ace_max_abs_mw': self.peak / 1e6}
+
+
+class BessThroughput(Accumulator):
+    """Charged/discharged BESS energy and equivalent full cycles."""
+    def start(self, cfg):
+        super().start(cfg)
+        self.dis = self.chg = 0.0
+
+    def update(self, block, t, k0):
+        p = block['P_k']
+        self.dis += float(np.sum(p[p > 0]))
+        self.chg -= float(np.sum(p[p < 0]))
+
+    def result(self):
+        to_mwh = self.cfg.dt / 3600 / 1e6
+        throughput = (self.dis + self.chg) * to_mwh
+        return {'bess_discharge_mwh': self.dis * to_mwh, 'bess_charge_mwh': self.chg * to_mwh,
+                'bess_throughput_mwh': throughput, 'bess_cycles': throughput / (2 * self.cfg.bess_E_MWh)}
+
+
+class TimeBelow(Accumulator):
+    """Time spent with f_bawu below a threshold (default 49.8 Hz)."""
+    def __init__(self, threshold_hz: float = 49.8):
+        self.threshold_hz = threshold_hz
+
+    def start(self, cfg):
+        super().start(cfg)
+        self.count = 0
+
+    def update(self, block, t, k0):
+        self.count += int(np.count_nonzero(block['f_bawu'] < self.threshold_hz))
+
+    def result(self):
+        return {f"time_below_{str(self.threshold_hz).replace('.', '_')}_s": self.count * self.cfg.dt}
+
+
+def default_accumulators() -> list:
+    """The existing KPIs plus ACE, BESS throughput, time below 49.8 Hz and peak RoCoF."""
+    return [NadirRecovery(), MaxImport(), InitialRocof(), PeakRocof(), AceStats(), BessThroughput(), TimeBelow(49.8)]
+
+
+def collect_kpis(accumulators, cfg) -> dict:
+    """Merges the results of all accumulators (plus the static BESS inertia KPI)."""
+    kpis = {'h_bess_s': (cfg.bess_k_rocof * cfg.F0) / (2 * cfg.S_base)}
+    for acc in accumulators:
+        kpis.update(acc.result())
+    return kpis
+
+
+def run_kpis(cfg, accumulators=None, block_steps: int = 4096, disturbance=None) -> dict:
+    """Runs the engine without storing any time series and returns only the online KPIs."""
+    accumulators = default_accumulators() if accumulators is None else accumulators
+    for acc in accumulators:
+        acc.start(cfg)
+    for block, t, k0 in iter_blocks(cfg, block_steps, disturbance):
+        for acc in accumulators:
+            acc.update(block, t, k0)
+    return collect_kpis(accumulators, cfg)
+
+
+def accumulate(r, accumulators=None) -> dict:
+    """Online KPIs evaluated on a finished result dict (one block)."""
+    accumulators = default_accumulators() if accumulators is None else accumulators
+    for acc in accumulators:
+        acc.start(r['cfg'])
+        acc.update(r, r['t'], 0)
+    return collect_kpis(accumulators, r['cfg'])
@@ -0,0 +1,313 @@
+import itertools
+
+import numpy as np
+from src.sim_config import SimulationConfig
+from src.engine import SIGNALS, BESS_MODES, EngineConstants, EngineState, TimeAxis, allocate_outputs, advance, result_dict
+from src.ensemble import stack_config_params
+
+# -------------------- Linearisierter Kern (Zustandsraum, ZOH, Eigenwerte) --------------------
+# Between saturation events the model is linear: swing equations with damping D, FCR first-order
+# lag, tie line T12, AGC integrator and (while the BESS is active and within its limits) the BESS
+# delivering the AGC request plus droop/RoCoF damping. States x and inputs u (SI units):
+STATES = ['df_bw', 'df_fr', 'p_fcr_bw', 'p_fcr_fr', 'agc', 'e_bess']  # [Hz, Hz, W, W, W, J discharged]
+INPUTS = ['dP_bw', 'dP_fr']                                          # power deficits [W]
+# Balancing used internally by expm (Hz, GW, GJ), SI matrices are scaled to O(1) entries
+_SCALE = np.array([1.0, 1.0, 1e9, 1e9, 1e9, 1e9, 1e9, 1e9])
+
+
+def stack_params(cfgs: list) -> dict:
+    """stack_config_params plus 'Ki', the integral gain of the AGC the engine builds for each config."""
+    p = stack_config_params(cfgs)
+    p['Ki'] = np.array([EngineConstants(cfg).Ki for cfg in cfgs])
+    return p
+
+
+def config_params(cfg: SimulationConfig) -> dict:
+    """Numeric parameters of one config as 0-d arrays (the batched functions accept (N,) arrays as well)."""
+    return {name: value[0] for name, value in stack_params([cfg]).items()}
+
+
+def param_grid(base: SimulationConfig, **axes) -> dict:
+    """Parameter arrays for the Cartesian product of `axes` around `base`, without building configs,
+    e.g. param_grid(cfg, H_sys=np.linspace(2, 6, 50), T12=np.linspace(5e8, 5e9, 40)) -> 2000 sets."""
+    p = config_params(base)
+    names = list(axes)
+    combos = np.array(list(itertools.product(*(axes[n] for n in names))), dtype=float)
+    out = {name: np.full(len(combos), value, dtype=float) for name, value in p.items()}
+    for i, name in enumerate(names):
+        out[name] = combos[:, i]
+    return out
+
+
+def _rows(p: dict, bess_on) -> np.ndarray:
+    """Rows of [A | B] with shape (..., 6, 8); bess_on selects the structure with the BESS in the loop."""
+    on = np.asarray(bess_on, dtype=float)
+    kb = (p['F0'] / (2 * p['H_sys'])) / p['S_base']
+    kf = (p['F0'] / (2 * p['H_sys_fr'])) / p['S_base_fr']
+    d_bw, d_fr = p['D_sys'] / (2 * p['H_sys']), p['D_sys_fr'] / (2 * p['H_sys_fr'])
+    kdroop_bw, kdroop_fr = p['fcr_bw_max'] / p['fcr_full_activation_df'], p['fcr_fr_max'] / p['fcr_full_activation_df']
+    T12, tau = p['T12'], p['fcr_tau']
+    shape = np.broadcast(kb, on, T12).shape
+    R = np.zeros(shape + (6, 8))
+    # Swing BaWü; the RoCoF term of the BESS acts like extra inertia: ḟ (1 + kb k_rocof) = ...
+    R[..., 0, 0] = -kb * T12 - d_bw - kb * p['bess_k_damp'] * on
+    R[..., 0, 1] = kb * T12
+    R[..., 0, 2] = kb
+    R[..., 0, 4] = kb * on
+    R[..., 0, 6] = -kb
+    R[..., 0, :] /= (1 + kb * p['bess_k_rocof'] * on)[..., None]
+    # Swing France
+    R[..., 1, 0] = kf * T12
+    R[..., 1, 1] = -kf * T12 - d_fr
+    R[..., 1, 3] = kf
+    R[..., 1, 7] = -kf
+    # FCR lag (unsaturated droop)
+    R[..., 2, 0] = -kdroop_bw / tau
+    R[..., 2, 2] = -1 / tau
+    R[..., 3, 1] = -kdroop_fr / tau
+    R[..., 3, 3] = -1 / tau
+    # AGC integrator: ACE = -(B Δf + P_tie)
+    R[..., 4, 0] = -p['Ki'] * (p['B_bias'] + T12)
+    R[..., 4, 1] = p['Ki'] * T12
+    # BESS energy: ė = P_k = agc - k_damp Δf - k_rocof ḟ
+    R[..., 5, :] = -(p['bess_k_rocof'] * on)[..., None] * R[..., 0, :]
+    R[..., 5, 0] -= p['bess_k_damp'] * on
+    R[..., 5, 4] += on
+    return R
+
+
+def state_matrices(p: dict, bess_on=True):
+    """Continuous-time A (..., 6, 6) and B (..., 6, 2) for the parameter dict p (scalars or (N,) arrays)."""
+    R = _rows(p, bess_on)
+    return R[..., :6], R[..., 6:]
+
+
+def expm(M: np.ndarray) -> np.ndarray:
+    """Matrix exponential of one or a stack of square matrices (Padé(6,6) with scaling and squaring)."""
+    M = np.asarray(M, dtype=float)
+    norm = np.max(np.sum(np.abs(M), axis=-2))
+    s = int(max(0, np.ceil(np.log2(norm / 0.5)))) if norm > 0 else 0
+    X = M / 2.0 ** s
+    eye = np.broadcast_to(np.eye(M.shape[-1]), M.shape)
+    N, D, Xk, c = eye.copy(), eye.copy(), eye, 1.0
+    for k in range(1, 7):
+        c *= (6 - k + 1) / (k * (12 - k + 1))
+        Xk = Xk @ X
+        N += c * Xk
+        D += (-1) ** k * c * Xk
+    E = np.linalg.solve(D, N)
+    for _ in range(s):
+        E = E @ E
+    return E
+
+
+def transition(p: dict, bess_on, h) -> np.ndarray:
+    """Exact zero-order-hold transition of the augmented state z = [x, u] over h seconds: z(t+h) = Φ z(t).
+    Φ = [[Ad, Bd], [0, I]] with Ad = e^{Ah}, Bd = ∫_0^h e^{Aτ} dτ B."""
+    R = _rows(p, bess_on)
+    M = np.zeros(R.shape[:-2] + (8, 8))
+    M[..., :6, :] = R * (_SCALE[None, :] / _SCALE[:6, None])
+    Phi = expm(M * np.asarray(h, dtype=float)[..., None, None])
+    return Phi * (_SCALE[:, None] / _SCALE[None, :])
+
+
+def discretize(p: dict, bess_on, h):
+    """(Ad, Bd) of the ZOH discretization with step h."""
+    Phi = transition(p, bess_on, h)
+    return Phi[..., :6, :6], Phi[..., :6, 6:]
+
+
+def propagate(Phi: np.ndarray, z0: np.ndarray, n: int) -> np.ndarray:
+    """z_k = Φ^k z0 for k = 0..n-1 as an (n, m) array, with O(√n) Python iterations (blocked powers)."""
+    m = len(z0)
+    if n <= 0:
+        return np.zeros((0, m))
+    b = max(1, min(n, int(np.sqrt(n)) + 1))
+    powers = np.empty((b, m, m))
+    powers[0] = np.eye(m)
+    for j in range(1, b):
+        powers[j] = Phi @ powers[j - 1]
+    Phi_b = Phi @ powers[-1]
+    starts = np.empty((-(-n // b), m))
+    starts[0] = z0
+    for i in range(1, len(starts)):
+        starts[i] = Phi_b @ starts[i - 1]
+    return np.einsum('jmn,in->ijm', powers, starts).reshape(-1, m)[:n]
+
+
+# -------------------- Zeitbereich: linear mit nichtlinearem Fallback --------------------
+def _structure(cfg: SimulationConfig):
+    """Segments of constant structure: (t_start, bess_on, deficit) from t=0."""
+    bess = BESS_MODES.get(cfg.bess_mode, 2) != BESS_MODES['off']
+    segs = [(0.0, False, 0.0), (cfg.t_fault, False, cfg.P_loss)]
+    if bess:
+        segs.append((cfg.t_fault + cfg.k_delay, True, cfg.P_loss))
+    return segs
+
+
+def _linear_grid(cfg: SimulationConfig, p: dict, h: float):
+    """Linear trajectory on a grid of step h that also contains every structure change and T."""
+    segs = _structure(cfg) + [(cfg.T, None, None)]
+    t_all, z_all, rows_all, on_all = [], [], [], []
+    z = np.zeros(8)
+    for (ta, on, dP), (tb, _, _) in zip(segs[:-1], segs[1:]):
+        if tb <= ta:
+            continue
+        z[6] = dP
+        n = max(1, int(np.ceil((tb - ta) / h - 1e-9)))
+        zs = propagate(transition(p, on, h), z, n)
+        t_all.append(ta + h * np.arange(n))
+        z_all.append(zs)
+        rows_all.append(np.broadcast_to(_rows(p, on), (n, 6, 8)))
+        on_all.append(np.full(n, on))
+        z = transition(p, on, tb - t_all[-1][-1]) @ zs[-1]
+    t_all.append(np.array([cfg.T])); z_all.append(z[None]); rows_all.append(rows_all[-1][-1:]); on_all.append(on_all[-1][-1:])
+    return np.concatenate(t_all), np.concatenate(z_all), np.concatenate(rows_all), np.concatenate(on_all)
+
+
+def _signals(cfg: SimulationConfig, c: EngineConstants, z: np.ndarray, rows: np.ndarray, on: np.ndarray) -> dict:
+    rocof = np.einsum('ij,ij->i', z, rows[:, 0])
+    P_k = np.where(on, np.einsum('ij,ij->i', z, rows[:, 5]), 0.0)
+    zeros = np.zeros(len(z))
+    return {
+        'f_bawu': cfg.F0 + z[:, 0], 'f_fr': cfg.F0 + z[:, 1], 'P_k': P_k, 'P_f': zeros, 'P_g1': zeros.copy(),
+        'P_g2': zeros.copy(), 'P_mfrr': zeros.copy(), 'P_tie': cfg.T12 * (z[:, 0] - z[:, 1]),
+        'P_fcr_bw': z[:, 2], 'P_fcr_fr': z[:, 3], 'P_total': P_k.copy(), 'bess_share_history': np.ones(len(z)),
+        'SoC': 0.5 - (z[:, 5] / 3.6e9) / c.E_dis, 'agc': z[:, 4], 'rocof': rocof,
+    }
+
+
+def limit_events(cfg: SimulationConfig, t: np.ndarray, sig: dict, on: np.ndarray) -> dict:
+    """
+    First index at which each nonlinearity neglected by the linear core becomes active (None if never):
+    FCR saturation, BESS capacity/ramp/deadband/trim/charging/SoC limits, AGC clipping, dispatch of the
+    conventional plants, BESS share change after the assist phase and the aFRR→mFRR handover.
+    """
+    c = EngineConstants(cfg)
+    df, agc, P_k = sig['f_bawu'] - cfg.F0, sig['agc'], sig['P_k']
+    after = t >= cfg.t_fault
+    soc = sig['SoC']
+    cap = c.k_p_max * np.minimum(1.0, np.minimum(np.maximum(0.0, c.soc_max - soc), np.maximum(0.0, soc - c.soc_min)) / c.soc_half_band)
+    rate = np.zeros(len(t))
+    if len(t) > 1:
+        rate[1:] = np.diff(P_k) / np.maximum(np.diff(t), 1e-12)
+    conditions = {
+        'fcr_bw_saturated': np.abs(df) * (cfg.fcr_bw_max / cfg.fcr_full_activation_df) > cfg.fcr_bw_max,
+        'fcr_fr_saturated': np.abs(sig['f_fr'] - cfg.F0) * (cfg.fcr_fr_max / cfg.fcr_full_activation_df) > cfg.fcr_fr_max,
+        'agc_clipped': (agc > c.agc_max_dis) | (agc < -c.agc_max_chg),
+        'bess_capacity': on & ((np.abs(agc) > c.k_p_max) | (np.abs(P_k) > cap)),
+        'bess_ramp': on & ((rate > cfg.k_ramp) | (rate < -cfg.bess_ramp_out_mw_per_sec * 1e6)),
+        'bess_deadband': on & (np.abs(df) <= cfg.bess_deadband),
+        'bess_trim': on & (np.abs(df) <= cfg.df_close_hz) & (np.abs(agc) > cfg.bess_trim_cap),
+        'bess_charging': on & (P_k < 0),
+        'soc_limit': (soc <= c.soc_min) | (soc >= c.soc_max),
+        'conventional_dispatch': (t >= cfg.t_fault + min(cfg.f_delay, cfg.gud1_delay, cfg.gud2_delay)) & (agc - P_k > 0),
+        'bess_share': on & (t - cfg.t_fault >= cfg.bess_min_assist_sec) & (np.abs(df) <= cfg.df_trim_in),
+        'mfrr_handover': (t - cfg.t_fault >= cfg.mfrr_delay) & (np.abs(df) <= cfg.restore_tol_hz) &
+                         ((np.abs(agc) > cfg.ace_thresh) | (np.abs(P_k) / c.total_afrr_cap > cfg.util_thresh)),
+    }
+    events = {}
+    for name, mask in conditions.items():
+        hit = np.flatnonzero(mask & after)
+        events[name] = int(hit[0]) if len(hit) else None
+    return events
+
+
+def _state_at(p: dict, t: np.ndarray, z: np.ndarray, on: np.ndarray, t_k: float) -> np.ndarray:
+    """Linear state z at time t_k, propagated exactly from the last grid sample at or before t_k."""
+    j = max(0, int(np.searchsorted(t, t_k, side='right')) - 1)
+    return transition(p, on[j], t_k - t[j]) @ z[j]
+
+
+def _handover(cfg: SimulationConfig, p: dict, c: EngineConstants, axis: TimeAxis, t, z, on, k_s: int) -> EngineState:
+    """EngineState at step k_s mapped from the linear trajectory (conventional plants, mFRR and λ still idle)."""
+    z_k, z_prev = _state_at(p, t, z, on, axis.at(k_s)), _state_at(p, t, z, on, axis.at(k_s - 1))
+    on_prev = bool(on[max(0, int(np.searchsorted(t, axis.at(k_s - 1), side='right')) - 1)])
+    s = EngineState(cfg)
+    s.k = k_s
+    s.f_bawu, s.f_fr = cfg.F0 + float(z_k[0]), cfg.F0 + float(z_k[1])
+    s.soc = 0.5 - (float(z_k[5]) / 3.6e9) / c.E_dis
+    s.prev_df = float(z_prev[0])
+    s.p_k = s.P_k = float(_rows(p, on_prev)[5] @ z_prev) if on_prev else 0.0
+    s.p_fcr_bw, s.p_fcr_fr, s.integral_term = float(z_k[2]), float(z_k[3]), float(z_k[4])
+    return s
+
+
+def simulate_linear(cfg: SimulationConfig, h: float = None, fallback: bool = True) -> dict:
+    """
+    Closed-form response of the linear core with exact ZOH steps of h seconds (default cfg.dt; any h
+    gives exact samples of the linear model), in the layout of simulate() on a possibly non-uniform 't'.
+    'limits' = {nonlinearity: first time the linear trajectory activates it (None if never)}; the
+    linear model is only valid before the earliest of these times ('t_switch', cause 'switch_reason').
+    fallback=True hands the state over to the nonlinear engine at the last engine step before
+    the last valid linear sample and continues with engine.advance (dt steps) to cfg.T. fallback=False cuts the result
+    at t_switch instead. Runs that never hit a limit stay linear and add 'agc' and 'rocof'.
+    """
+    p = config_params(cfg)
+    axis = TimeAxis(cfg)
+    c = EngineConstants(cfg, axis)
+    t, z, rows, on = _linear_grid(cfg, p, h or cfg.dt)
+    sig = _signals(cfg, c, z, rows, on)
+    events = limit_events(cfg, t, sig, on)
+    base = {'soc_min': c.soc_min, 'soc_max': c.soc_max, 'cfg': cfg,
+            'limits': {name: (float(t[i]) if i is not None else None) for name, i in events.items()}}
+    hits = {name: i for name, i in events.items() if i is not None}
+    if not hits:
+        return {'t': t, **sig, **base, 't_switch': None, 'switch_reason': None}
+
+    reason = min(hits, key=hits.get)
+    t_switch = float(t[hits[reason]])
+    if not fallback:
+        n = hits[reason]
+        return {'t': t[:n], **{name: value[:n] for name, value in sig.items()}, **base,
+                't_switch': t_switch, 'switch_reason': reason}
+
+    # Nonlinear fallback from the last engine step not after the last valid linear sample (with h > dt the
+    # limit may have become active anywhere after it); linear samples before that step, engine samples from it on
+    t_valid = float(t[max(0, hits[reason] - 1)])
+    k_s = max(1, axis.first(lambda tk: tk > t_valid) - 1)
+    s = _handover(cfg, p, c, axis, t, z, on, k_s)
+    out = allocate_outputs(axis.n_steps - k_s)
+    advance(s, c, out, axis.n_steps - 1, offset=k_s)
+    res = result_dict(s, c, out, axis.values(k_s), cfg)
+    n = int(np.searchsorted(t, axis.at(k_s), side='left'))
+    res['t'] = np.concatenate((t[:n], res['t']))
+    for name in SIGNALS:
+        res[name] = np.concatenate((sig[name][:n], res[name]))
+    res.update({**base, 't_switch': t_switch, 'switch_reason': reason})
+    return res
+
+
+# -------------------- Eigenwert-Screening --------------------
+def screen(params, bess_on=None) -> dict:
+    """
+    Small-signal screening of many parameter sets at once (no time-domain simulation). `params` is a
+    list of SimulationConfig or a dict of parameter arrays (see param_grid). The BESS energy state is
+    left out; modes at λ = 0 (pure integrators) are ignored for damping and time constants.
+    Returns (N,) arrays: 'stable', 'max_real', 'min_damping_ratio' (1.0 without oscillatory modes),
+    'dominant_freq_hz' (least damped oscillation, 0.0 if none), 'slowest_time_constant_s' and the
+    (N, 5) 'eigenvalues'.
+    """
+    p = stack_params(params) if isinstance(params, (list, tuple)) else params
+    if bess_on is None:
+        bess_on = np.asarray(p['bess_mode']) != BESS_MODES['off']
+    A, _ = state_matrices(p, bess_on)
+    A = A[..., :5, :5] * (_SCALE[None, :5] / _SCALE[:5, None])
+    lam = np.linalg.eigvals(A)
+    re, im = lam.real, np.abs(lam.imag)
+    live = np.abs(lam) > 1e-9
+    osc = live & (im > 1e-9)
+    zeta = np.where(osc, -re / np.where(live, np.abs(lam), 1.0), np.inf)
+    least = np.argmin(zeta, axis=-1)
+    min_zeta = np.take_along_axis(zeta, least[..., None], -1)[..., 0]
+    has_osc = np.isfinite(min_zeta)
+    slow = np.where(live & (re < 0), -re, np.inf).min(axis=-1)
+    max_real = np.where(live, re, -np.inf).max(axis=-1)
+    return {
+        'stable': max_real < 0,
+        'max_real': max_real,
+        'min_damping_ratio': np.where(has_osc, min_zeta, 1.0),
+        'dominant_freq_hz': np.where(has_osc, np.take_along_axis(im, least[..., None], -1)[..., 0] / (2 * np.pi), 0.0),
+        'slowest_time_constant_s': np.where(np.isfinite(slow), 1.0 / slow, np.inf),
+        'eigenvalues': lam,
+    }
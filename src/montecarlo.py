@@ -0,0 +1,43 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+from src.sim_config import SimulationConfig
+from src.kpi import default_accumulators, collect_kpis
+from src.recording import Recorder, record
+
+# -------------------- Monte-Carlo-Ensembles --------------------
+def _member(cfg: SimulationConfig, make_disturbance, decimation: int, seed: np.random.SeedSequence):
+    """One ensemble member: decimated f_bawu trace and online KPIs."""
+    accumulators = default_accumulators()
+    res = record(cfg, Recorder(['f_bawu'], decimation=decimation), accumulators, make_disturbance(seed))
+    return res['t'], res['f_bawu'], collect_kpis(accumulators, cfg)
+
+
+def monte_carlo(cfg: SimulationConfig, make_disturbance, n_runs: int, seed: int = 0, percentiles=(5, 50, 95),
+                decimation: int = 10, workers: int = 1) -> dict:
+    """
+    Runs n_runs members with independent random streams. make_disturbance(seed) builds the
+    disturbance source(s) of one member from its np.random.SeedSequence, e.g.
+        lambda s: [Contingencies([(600.0, 1e9, 0)]), Noise(200e6, tau=60.0, seed=s)]
+    (use a module-level function with workers > 1). Returns the percentile bands of f_bawu (every
+    `decimation`-th step) and of every KPI, the KPIs of every member and the member seeds, so any
+    member can be replayed with make_disturbance(result['seeds'][i]).
+    """
+    seeds = np.random.SeedSequence(seed).spawn(n_runs)
+    run = partial(_member, cfg, make_disturbance, decimation)
+    if workers == 1:
+        members = [run(s) for s in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            members = list(pool.map(run, seeds))
+
+    t = members[0][0]
+    traces = np.vstack([f for _, f, _ in members])
+    runs = [kpis for _, _, kpis in members]
+    kpi_bands = {}
+    for key in runs[0]:
+        values = [k[key] for k in runs if k[key] is not None]
+        kpi_bands[key] = {'n': len(values), **{p: float(np.percentile(values, p)) if values else None for p in percentiles}}
+    return {'t': t, 'f_bawu': {p: np.percentile(traces, p, axis=0) for p in percentiles},
+            'kpis': kpi_bands, 'runs': runs, 'seeds': seeds, 'cfg': cfg}
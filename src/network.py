@@ -0,0 +1,155 @@
+import numpy as np
+from src.sim_config import SimulationConfig
+
+from src.afrr_mfrr import AGC_Controller, update_afrr_mfrr_logic
+from src.afrr_mfrr import dispatch_conventional_afrr
+from src.bess import update_bess_power_and_soc
+
+from src.helpers import initialize_state, finalize_arrays
+from src.engine import n_steps_for
+from src.disturbance import as_disturbance
+
+
+# -------------------- N-Area-Netz --------------------
+# Area 0 is the study area with the detailed control chain of simulate() (BESS, PSH, GuD, mFRR, λ).
+# All other areas have FCR and an optional aggregated aFRR (AGC integrator with capacity afrr_max).
+# B_bias is per area; the AGC of area 0 uses B_bias[0] (not cfg.B_bias).
+# Tie lines are a sparse edge list (i, j, T_ij [W/Hz]); the export of an area is
+#   P_export_i = Σ_(i,j) T_ij (Δf_i - Δf_j) - Σ_(j,i) T_ji (Δf_j - Δf_i)
+# and is evaluated with np.bincount, so the cost per step scales with the number of ties.
+
+class AreaNetwork:
+    """Per-area parameters (length n_areas) and tie lines as (from, to, T [W/Hz]) tuples."""
+    def __init__(self, H, D, S_base, fcr_max, B_bias, ties, afrr_max=None, P_loss=None, names=None):
+        self.H, self.D, self.S_base = (np.asarray(x, dtype=float) for x in (H, D, S_base))
+        self.fcr_max, self.B_bias = np.asarray(fcr_max, dtype=float), np.asarray(B_bias, dtype=float)
+        n = len(self.H)
+        self.afrr_max = np.zeros(n) if afrr_max is None else np.asarray(afrr_max, dtype=float)
+        self.P_loss = np.zeros(n) if P_loss is None else np.asarray(P_loss, dtype=float)
+        self.names = list(names) if names is not None else [f'Area {i}' for i in range(n)]
+        for name in ('D', 'S_base', 'fcr_max', 'B_bias', 'afrr_max', 'P_loss', 'names'):
+            if len(getattr(self, name)) != n:
+                raise ValueError(f"{name} has {len(getattr(self, name))} entries, expected one per area ({n}).")
+        ties = list(ties)
+        self.tie_from = np.array([i for i, _, _ in ties], dtype=np.intp)
+        self.tie_to = np.array([j for _, j, _ in ties], dtype=np.intp)
+        self.tie_T = np.array([T for _, _, T in ties], dtype=float)
+        if len(ties) and (min(self.tie_from.min(), self.tie_to.min()) < 0 or max(self.tie_from.max(), self.tie_to.max()) >= n):
+            raise ValueError(f"Tie line endpoints must be area indices 0..{n - 1}.")
+        if np.any(self.tie_from == self.tie_to):
+            raise ValueError("A tie line must connect two different areas.")
+
+    @property
+    def n_areas(self) -> int:
+        return len(self.H)
+
+    def exports(self, df: np.ndarray) -> np.ndarray:
+        """Net export of every area [W] for the frequency deviations df."""
+        flow = self.tie_T * (df[self.tie_from] - df[self.tie_to])
+        n = self.n_areas
+        return np.bincount(self.tie_from, flow, n) - np.bincount(self.tie_to, flow, n)
+
+
+def two_area_network(cfg: SimulationConfig) -> AreaNetwork:
+    """The BaWü–France system of simulate() as an AreaNetwork."""
+    return AreaNetwork(H=[cfg.H_sys, cfg.H_sys_fr], D=[cfg.D_sys, cfg.D_sys_fr], S_base=[cfg.S_base, cfg.S_base_fr],
+                       fcr_max=[cfg.fcr_bw_max, cfg.fcr_fr_max], B_bias=[cfg.B_bias, cfg.B_bias],
+                       ties=[(0, 1, cfg.T12)], P_loss=[cfg.P_loss, 0.0], names=['BaWü', 'France'])
+
+
+def ring_network(cfg: SimulationConfig, n_areas: int, T_tie: float = None, afrr_max: float = 0.0) -> AreaNetwork:
+    """
+    Study area (BaWü parameters) plus n_areas-1 neighbours with the France parameters, connected
+    in a ring with T_tie (default cfg.T12) per line. afrr_max gives every neighbour an aggregated aFRR.
+    """
+    if n_areas < 2:
+        raise ValueError("A network needs at least two areas.")
+    T_tie = cfg.T12 if T_tie is None else T_tie
+    rest = n_areas - 1
+    ties = [(i, i + 1, T_tie) for i in range(n_areas - 1)] + ([(n_areas - 1, 0, T_tie)] if n_areas > 2 else [])
+    return AreaNetwork(H=[cfg.H_sys] + [cfg.H_sys_fr] * rest, D=[cfg.D_sys] + [cfg.D_sys_fr] * rest,
+                       S_base=[cfg.S_base] + [cfg.S_base_fr] * rest, fcr_max=[cfg.fcr_bw_max] + [cfg.fcr_fr_max] * rest,
+                       B_bias=[cfg.B_bias] * n_areas, ties=ties, afrr_max=[0.0] + [afrr_max] * rest,
+                       P_loss=[cfg.P_loss] + [0.0] * rest, names=['BaWü'] + [f'Area {i}' for i in range(1, n_areas)])
+
+
+def simulate_network(cfg: SimulationConfig, net: AreaNetwork = None, record_ties: bool = False, disturbance=None,
+                     block_steps: int = 4096) -> dict:
+    """
+    N-area version of simulate(). Swing equations, FCR, the aggregated AGC of the other areas and the
+    tie flows are one vectorized update per step; area 0 runs the control chain of simulate().
+    The result has the keys of simulate() for area 0 (f_fr is area 1) plus per-area arrays of shape
+    (n_steps, n_areas): 'f_area', 'P_export', 'P_fcr_area', 'P_afrr_area' ('P_tie_lines' per tie
+    with record_ties=True). disturbance: optional per-area Disturbance source(s) (see disturbance.py),
+    streamed in blocks of block_steps. With the default two-area network the results equal simulate().
+    """
+    net = net or two_area_network(cfg)
+    n_steps = n_steps_for(cfg)
+    n = net.n_areas
+    state = initialize_state(cfg, n_steps)
+
+    total_afrr_cap = cfg.k_p_max + cfg.f_p_max + cfg.gud1_p_max + cfg.gud2_p_max
+    agc = AGC_Controller(cfg.dt, total_afrr_cap, cfg.k_p_max, float(net.B_bias[0]))  # area 0 uses the network's bias
+
+    # Per-area state and history
+    f_area = np.full((n_steps, n), cfg.F0)
+    P_export, P_fcr_area, P_afrr_area = np.zeros((n_steps, n)), np.zeros((n_steps, n)), np.zeros((n_steps, n))
+    P_tie_lines = np.zeros((n_steps, len(net.tie_T))) if record_ties else None
+    p_fcr, integral = np.zeros(n), np.zeros(n)
+    kdroop = net.fcr_max / cfg.fcr_full_activation_df
+    fcr_gain = cfg.dt / cfg.fcr_tau
+    a_swing, two_H = cfg.F0 / (2 * net.H), 2 * net.H
+    dist = as_disturbance(disturbance, cfg, n) if disturbance is not None else None
+    dist_k0 = dist_k1 = 0
+
+    for k in range(n_steps - 1):
+        t_k = state['t'][k]
+        deltaP = net.P_loss if t_k >= cfg.t_fault else np.zeros(n)
+        if dist is not None:
+            if k >= dist_k1:
+                dist_k0, dist_k1 = k, min(k + block_steps, n_steps - 1)
+                dist_block = dist.block(dist_k0, dist_k1)
+            deltaP = deltaP + dist_block[k - dist_k0]
+        df_area = f_area[k] - cfg.F0
+        df = df_area[0]
+        rocof = (df - state['prev_df']) / cfg.dt
+        state['prev_df'] = df
+        export = net.exports(df_area)
+        if record_ties:
+            P_tie_lines[k] = net.tie_T * (df_area[net.tie_from] - df_area[net.tie_to])
+        state['P_tie'][k] = export[0]
+
+        # FCR of all areas
+        p_fcr += fcr_gain * (np.clip(-kdroop * df_area, -net.fcr_max, net.fcr_max) - p_fcr)
+        state['P_fcr_bw'][k] = state['p_fcr_bw_state'] = p_fcr[0]
+        if n > 1:
+            state['P_fcr_fr'][k] = state['p_fcr_fr_state'] = p_fcr[1]
+
+        # Study area: aFRR/mFRR, BESS, conventional dispatch
+        p_afrr_req = update_afrr_mfrr_logic(state, k, df, export[0], agc, total_afrr_cap, cfg)
+        update_bess_power_and_soc(state, k, df, rocof, p_afrr_req, cfg)
+        dispatch_conventional_afrr(state, k, p_afrr_req, cfg)
+        state['P_total'][k] = state['P_k'][k] + state['P_f'][k] + state['P_g1'][k] + state['P_g2'][k] + state['P_mfrr'][k]
+
+        # Aggregated AGC of the other areas: ACE = -(B·Δf + P_export)
+        integral += agc.Ki * -(net.B_bias * df_area + export) * cfg.dt
+        np.clip(integral, -net.afrr_max, net.afrr_max, out=integral)
+        p_ctrl = integral.copy()
+        p_ctrl[0] = state['P_total'][k]
+
+        # Swing equations of all areas
+        P_net = -deltaP + p_ctrl + p_fcr - export
+        dfdt = a_swing * (P_net / net.S_base) - (net.D * df_area) / two_H
+        f_area[k + 1] = f_area[k] + dfdt * cfg.dt
+        P_export[k], P_fcr_area[k], P_afrr_area[k] = export, p_fcr, p_ctrl
+
+    finalize_arrays(state, n_steps)
+    for arr in (P_export, P_fcr_area, P_afrr_area) + ((P_tie_lines,) if record_ties else ()):
+        arr[-1] = arr[-2]
+    state['f_bawu'] = f_area[:, 0]
+    state['f_fr'] = f_area[:, 1] if n > 1 else np.full(n_steps, cfg.F0)
+    res = {**state, 'cfg': cfg, 'network': net, 'f_area': f_area, 'P_export': P_export,
+           'P_fcr_area': P_fcr_area, 'P_afrr_area': P_afrr_area}
+    if record_ties:
+        res['P_tie_lines'] = P_tie_lines
+    return res
@@ -0,0 +1,372 @@
+from abc import abstractmethod
+
+import numpy as np
+from src.sim_config import SimulationConfig
+from src.cache import config_key, normalized_config
+from src.kpi import Accumulator, NadirRecovery, default_accumulators, collect_kpis
+from src.archive import config_from_params
+from src.recording import iter_blocks
+from src.engine import TimeAxis
+
+# -------------------- Auslegung / Optimierung --------------------
+# Sizing searches over SimulationConfig parameters. Every candidate runs block by block through the
+# engine; constraints are accumulators that report as soon as a violation is certain, so an infeasible
+# candidate stops at e.g. the nadir crossing (~10 s) instead of running the full T. Blocks are short
+# around the fault and end at every constraint deadline, so a run stops right after the violation.
+
+class Constraint(Accumulator):
+    """
+    Accumulator with a feasibility verdict. violated() may only return True once the violation is
+    certain. judge() gives the verdict from the KPIs of a completed run, so cached runs can be
+    re-checked against other constraints. The name identifies type and limit; deadline (set in
+    start) is a time at which the verdict can change without a new sample, e.g. a recovery deadline.
+    """
+    name = 'constraint'
+    deadline = None
+
+    @abstractmethod
+    def violated(self, final: bool = False) -> bool:
+        ...
+
+    @abstractmethod
+    def judge(self, kpis: dict, cfg: SimulationConfig):
+        """True if violated, False if met, None if the KPIs do not contain the quantity."""
+        ...
+
+    def result(self):
+        return {}
+
+
+class NadirAbove(Constraint):
+    """f_bawu must stay at or above limit_hz for the whole run."""
+    def __init__(self, limit_hz: float = 49.2):
+        self.limit_hz = limit_hz
+        self.name = f'nadir_hz >= {limit_hz}'
+
+    def start(self, cfg):
+        super().start(cfg)
+        self.f_min = np.inf
+
+    def update(self, block, t, k0):
+        self.f_min = min(self.f_min, float(np.min(block['f_bawu'])))
+
+    def violated(self, final=False):
+        return self.f_min < self.limit_hz
+
+    def judge(self, kpis, cfg):
+        return kpis['nadir_hz'] < self.limit_hz
+
+
+class RecoveryWithin(Constraint):
+    """Time to recovery (as in kpi_values) must not exceed ttr_max_s. The recovery time after the nadir
+    can only move later, so the run is aborted once t_fault + ttr_max_s has passed without recovery."""
+    def __init__(self, ttr_max_s: float):
+        self.ttr_max_s = ttr_max_s
+        self.name = f'ttr_s <= {ttr_max_s}'
+        self.recovery = NadirRecovery()
+
+    def start(self, cfg):
+        super().start(cfg)
+        self.recovery.start(cfg)
+        self.deadline, self.t_now = cfg.t_fault + self.ttr_max_s, -np.inf
+
+    def update(self, block, t, k0):
+        self.recovery.update(block, t, k0)
+        self.t_now = float(t[-1])
+
+    def violated(self, final=False):
+        t_rec = self.recovery.t_recovery
+        if t_rec is not None:
+            return t_rec > self.deadline
+        return final or self.t_now >= self.deadline
+
+    def judge(self, kpis, cfg):
+        t_rec = kpis['t_recovery_s']
+        return t_rec is None or t_rec > cfg.t_fault + self.ttr_max_s
+
+
+class MaxImportBelow(Constraint):
+    """Import over the tie line (-P_tie) must stay at or below limit_mw."""
+    def __init__(self, limit_mw: float):
+        self.limit_mw = limit_mw
+        self.name = f'max_import_mw <= {limit_mw}'
+
+    def start(self, cfg):
+        super().start(cfg)
+        self.max_import = -np.inf
+
+    def update(self, block, t, k0):
+        self.max_import = max(self.max_import, float(-np.min(block['P_tie'])) / 1e6)
+
+    def violated(self, final=False):
+        return self.max_import > self.limit_mw
+
+    def judge(self, kpis, cfg):
+        return kpis['max_import_mw'] > self.limit_mw
+
+
+class KpiLimit(Constraint):
+    """Bound on any online KPI of `accumulator` (e.g. KpiLimit('bess_cycles', BessThroughput(), hi=0.2)).
+    Checked at the end of the run only, so it never aborts early."""
+    def __init__(self, key: str, accumulator: Accumulator, lo: float = None, hi: float = None):
+        self.key, self.accumulator, self.lo, self.hi = key, accumulator, lo, hi
+        self.name = ' '.join(filter(None, [f'{lo} <=' if lo is not None else '', key, f'<= {hi}' if hi is not None else '']))
+
+    def start(self, cfg):
+        super().start(cfg)
+        self.accumulator.start(cfg)
+
+    def update(self, block, t, k0):
+        self.accumulator.update(block, t, k0)
+
+    def result(self):
+        return self.accumulator.result()
+
+    def violated(self, final=False):
+        return final and self.judge(self.accumulator.result(), self.cfg)
+
+    def judge(self, kpis, cfg):
+        if self.key not in kpis:
+            return None
+        value = kpis[self.key]
+        return value is None or (self.lo is not None and value < self.lo) or (self.hi is not None and value > self.hi)
+
+
+class History:
+    """
+    Simulated candidates of one or more searches. Only constraint-independent facts are kept: the
+    KPIs of completed runs and, for aborted runs, the constraint that stopped them. Every search
+    judges them against its own constraints, so one History can be shared between searches.
+    """
+    def __init__(self):
+        self.runs = []
+        self._by_key = {}
+
+    def get(self, cfg: SimulationConfig):
+        return self._by_key.get(config_key(cfg))
+
+    def add(self, cfg: SimulationConfig, run: dict):
+        known = self.get(cfg)
+        if known is None:
+            self._by_key[config_key(cfg)] = run
+            self.runs.append(run)
+        elif run['t_abort'] is None:
+            known.update(run)  # a completed run supersedes an aborted one of the same config
+
+    def near(self, base: dict, names, constraints) -> list:
+        """Known evaluations (see verdict) of runs that only differ from SimulationConfig(**base) in `names`."""
+        ref = normalized_config(SimulationConfig(**base))
+        evaluations = []
+        for run in self.runs:
+            if all(run['config'][k] == v for k, v in ref.items() if k not in names):
+                ev = verdict(run, constraints)
+                if ev is not None:
+                    evaluations.append(ev)
+        return evaluations
+
+
+def verdict(run: dict, constraints):
+    """
+    Evaluation of a stored run under `constraints`, or None if the run cannot decide it: an aborted
+    run only proves the violation of the constraint that stopped it, and a completed run is unknown
+    for constraints whose quantity is not in its KPIs.
+    """
+    cfg = config_from_params(run['config'])
+    if run['t_abort'] is not None:
+        if run['violated'] not in {c.name for c in constraints}:
+            return None
+        violated = run['violated']
+    else:
+        verdicts = [(c.name, c.judge(run['kpis'], cfg)) for c in constraints]
+        if any(v is None for _, v in verdicts):
+            return None
+        violated = next((name for name, v in verdicts if v), None)
+    return {'params': run['params'], 'feasible': violated is None, 'violated': violated, 't_abort': run['t_abort'],
+            'kpis': run['kpis'], 'config': run['config']}
+
+
+def evaluate(params: dict, constraints, base: dict = None, history: History = None, block_steps: int = 256,
+             fine_block: int = 5, fine_window: float = 60.0) -> dict:
+    """
+    Runs SimulationConfig(**base, **params) until the end or until a constraint is provably violated.
+    Constraints are checked after every block: fine_block steps during the fault and the following
+    fine_window seconds, block_steps afterwards, plus a block end at every constraint deadline. Returns {'params', 'feasible', 'violated' (constraint name or None),
+    't_abort' (None for a full run), 'kpis' (online KPIs, only for full runs), 'config', 'cached'
+    (True if served from history without a new run)}.
+    """
+    cfg = SimulationConfig(**{**(base or {}), **params})
+    if history is not None:
+        known = history.get(cfg)
+        if known is not None:
+            ev = verdict(known, constraints)
+            if ev is not None:
+                return {**ev, 'params': dict(params), 'cached': True}
+    accumulators = default_accumulators()
+    for acc in (*constraints, *accumulators):
+        acc.start(cfg)
+    violated, t_abort = None, None
+    axis = TimeAxis(cfg)
+    breaks = [axis.first(lambda t, d=c.deadline: t >= d) + 1 for c in constraints if c.deadline is not None]
+    blocks = iter_blocks(cfg, block_steps, fine_block=fine_block, fine_window=fine_window, breaks=breaks)
+    for block, t, k0 in blocks:
+        for acc in (*constraints, *accumulators):
+            acc.update(block, t, k0)
+        violated = next((c.name for c in constraints if c.violated()), None)
+        if violated is not None:
+            t_abort = float(t[-1])
+            blocks.close()
+            break
+    else:
+        violated = next((c.name for c in constraints if c.violated(final=True)), None)
+    kpis = collect_kpis((*accumulators, *constraints), cfg) if t_abort is None else None
+    run = {'params': dict(params), 'violated': violated if t_abort is not None else None, 't_abort': t_abort,
+           'kpis': kpis, 'config': normalized_config(cfg)}
+    if history is not None:
+        history.add(cfg, run)
+    return {'params': dict(params), 'feasible': violated is None, 'violated': violated, 't_abort': t_abort,
+            'kpis': kpis, 'config': run['config'], 'cached': False}
+
+
+def _stats(evaluations) -> dict:
+    """Counts the candidates that were actually simulated."""
+    runs = [ev for ev in evaluations if not ev['cached']]
+    return {'n_evals': len(runs), 'n_aborted': sum(ev['t_abort'] is not None for ev in runs)}
+
+
+# -------------------- 1-D: Bisektion --------------------
+def bisect(param: str, lo: float, hi: float, constraints, base: dict = None, feasible_above: bool = True,
+           tol: float = None, max_evals: int = 40, history: History = None, block_steps: int = 256) -> dict:
+    """
+    Smallest value of `param` in [lo, hi] that satisfies all constraints (largest value with
+    feasible_above=False), assuming feasibility is monotone in the parameter. Stops once the bracket
+    is narrower than tol (default 1e-3 of the range). Earlier evaluations in `history` shrink the
+    initial bracket.
+    Returns {'value', 'evaluation', 'bracket': (infeasible, feasible), 'n_evals', 'n_aborted', 'history'}.
+    """
+    base = base or {}
+    history = history if history is not None else History()
+    tol = tol if tol is not None else 1e-3 * (hi - lo)
+    evaluations = []
+
+    def run(x):
+        evaluations.append(evaluate({param: x}, constraints, base, history, block_steps))
+        return evaluations[-1]
+
+    # Bracket (bad, good): infeasible and feasible ends, warm-started from known points
+    bad, good = (lo, hi) if feasible_above else (hi, lo)
+    good_ev = None
+    known = history.near(base, [param], constraints)
+    for ev in known:
+        x = ev['config'][param]
+        if not min(lo, hi) <= x <= max(lo, hi):
+            continue
+        if ev['feasible'] and abs(x - bad) < abs(good - bad):
+            good, good_ev = x, ev
+        elif not ev['feasible'] and abs(good - x) < abs(good - bad):
+            bad = x
+    if good_ev is None:
+        good_ev = run(good)
+        if not good_ev['feasible']:
+            raise ValueError(f"{param}={good} violates '{good_ev['violated']}'; no feasible value in [{lo}, {hi}].")
+    if bad in (lo, hi) and not any(ev['config'][param] == bad for ev in known):
+        bad_ev = run(bad)
+        if bad_ev['feasible']:
+            good, good_ev = bad, bad_ev
+
+    while abs(good - bad) > tol and good != bad and _stats(evaluations)['n_evals'] < max_evals:
+        mid = 0.5 * (bad + good)
+        ev = run(mid)
+        if ev['feasible']:
+            good, good_ev = mid, ev
+        else:
+            bad = mid
+    return {'value': good, 'evaluation': good_ev, 'bracket': (bad, good),
+            **_stats(evaluations), 'history': history}
+
+
+# -------------------- n-D: Nelder-Mead --------------------
+def minimize(cost, bounds: dict, constraints, base: dict = None, x0: dict = None, penalty: float = None,
+             max_evals: int = 80, max_iter: int = 500, xtol: float = 1e-3, history: History = None,
+             block_steps: int = 256) -> dict:
+    """
+    Minimizes cost(params) subject to the constraints with a bounded Nelder-Mead search (no
+    derivatives). `cost` is a cheap function of the parameters (e.g. installed capacity), `bounds`
+    maps parameter names to (lo, hi). Infeasible candidates get cost + penalty, scaled up the earlier
+    they were aborted; candidates whose cost is not below the best feasible one are not simulated.
+    x0 defaults to the cheapest feasible point in `history`, else to the centre of the bounds.
+    xtol is the simplex size in units of the parameter ranges. The search stops after max_evals
+    simulations or max_iter Nelder-Mead iterations (cached and skipped candidates cost no simulation).
+    Returns {'params', 'cost', 'evaluation', 'n_evals', 'n_aborted', 'n_skipped', 'history'}.
+    """
+    base = base or {}
+    history = history if history is not None else History()
+    names = list(bounds)
+    lo = np.array([bounds[n][0] for n in names], dtype=float)
+    span = np.array([bounds[n][1] - bounds[n][0] for n in names], dtype=float)
+    T = SimulationConfig(**base).T
+    evaluations = []
+
+    def to_params(u):
+        return {n: float(v) for n, v in zip(names, lo + np.clip(u, 0.0, 1.0) * span)}
+
+    best = {'cost': np.inf, 'params': None, 'evaluation': None}
+    for ev in history.near(base, names, constraints):
+        p = {n: ev['config'][n] for n in names}
+        if ev['feasible'] and all(bounds[n][0] <= p[n] <= bounds[n][1] for n in names) and cost(p) < best['cost']:
+            best = {'cost': cost(p), 'params': p, 'evaluation': ev}
+    if x0 is None:
+        x0 = best['params'] or to_params(np.full(len(names), 0.5))
+    if penalty is None:
+        penalty = 10.0 * abs(cost(to_params(np.full(len(names), 0.5)))) + 1.0
+    skipped = 0
+
+    def objective(u):
+        nonlocal best, skipped
+        p = to_params(u)
+        c = cost(p)
+        if c >= best['cost']:
+            skipped += 1
+            return c
+        ev = evaluate(p, constraints, base, history, block_steps)
+        evaluations.append(ev)
+        if ev['feasible']:
+            best = {'cost': c, 'params': p, 'evaluation': ev}
+            return c
+        return c + penalty * (2.0 - (ev['t_abort'] if ev['t_abort'] is not None else T) / T)
+
+    # Initial simplex in normalized coordinates: x0 plus a quarter range along every axis
+    u0 = np.clip((np.array([x0[n] for n in names], dtype=float) - lo) / span, 0.0, 1.0)
+    simplex = [u0]
+    for i in range(len(names)):
+        u = u0.copy()
+        u[i] += 0.25 if u[i] + 0.25 <= 1.0 else -0.25
+        simplex.append(u)
+    values = [objective(u) for u in simplex]
+
+    for _ in range(max_iter):
+        if _stats(evaluations)['n_evals'] >= max_evals:
+            break
+        order = np.argsort(values)
+        simplex, values = [simplex[i] for i in order], [values[i] for i in order]
+        if max(np.max(np.abs(u - simplex[0])) for u in simplex[1:]) < xtol:
+            break
+        centroid = np.mean(simplex[:-1], axis=0)
+        reflected = np.clip(centroid + (centroid - simplex[-1]), 0.0, 1.0)
+        f_r = objective(reflected)
+        if f_r < values[0]:
+            expanded = np.clip(centroid + 2.0 * (centroid - simplex[-1]), 0.0, 1.0)
+            f_e = objective(expanded)
+            simplex[-1], values[-1] = (expanded, f_e) if f_e < f_r else (reflected, f_r)
+        elif f_r < values[-2]:
+            simplex[-1], values[-1] = reflected, f_r
+        else:
+            contracted = centroid + 0.5 * (simplex[-1] - centroid)
+            f_c = objective(contracted)
+            if f_c < values[-1]:
+                simplex[-1], values[-1] = contracted, f_c
+            else:
+                simplex = [simplex[0]] + [simplex[0] + 0.5 * (u - simplex[0]) for u in simplex[1:]]
+                values = [values[0]] + [objective(u) for u in simplex[1:]]
+
+    return {'params': best['params'], 'cost': best['cost'], 'evaluation': best['evaluation'],
+            **_stats(evaluations), 'n_skipped': skipped, 'history': history}
@@ -1,6 +1,8 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from src.sim_config import SimulationConfig
+from src.kpi import kpi_values
+from src.fastplot import FactsPlot
 
 from IPython.display import display, Markdown
 
@@ -49,36 +51,30 @@ def plot_results(r, title_suffix='', plot_end_time=None):
 
 def compute_kpis(r):
     """Berechnet die wesentlichen KPIs aus den Simulationsergebnissen."""
-    nadir_idx = int(np.argmin(r['f_bawu']))
-    ttr_val = None
-    try:
-        f_after_nadir = r['f_bawu'][nadir_idx:]
-        recovery_relative_idx = np.where(np.abs(f_after_nadir - r['cfg'].F0) <= r['cfg'].restore_tol_hz)[0][0]
-        recovery_abs_idx = nadir_idx + recovery_relative_idx
-        ttr_val = r['t'][recovery_abs_idx]
-        ttr_str = f"{ttr_val - r['cfg'].t_fault:.1f}"
-    except IndexError:
-        ttr_str = "Nicht wiederhergestellt"
-    
-    # NEU: Berechnung der künstlichen Trägheit durch BESS (RoCoF-Komponente)
-    # Formel: H_bess = (K_RoCoF * F0) / (2 * S_base)
-    H_bess_s = (r['cfg'].bess_k_rocof * r['cfg'].F0) / (2 * r['cfg'].S_base)
-    
+    v = kpi_values(r)
+    ttr_val = v['t_recovery_s']
+    ttr_str = f"{v['ttr_s']:.1f}" if ttr_val is not None else "Nicht wiederhergestellt"
+
     kpis = {
-        'Frequenz-Nadir [Hz]': f"{r['f_bawu'][nadir_idx]:.3f}",
-        'Zeitpunkt Nadir [s]': f"{r['t'][nadir_idx]:.1f}",
+        'Frequenz-Nadir [Hz]': f"{v['nadir_hz']:.3f}",
+        'Zeitpunkt Nadir [s]': f"{v['t_nadir_s']:.1f}",
         'Time to Recovery [s]': ttr_str,
-        'Max. Import [MW]': f"{-np.min(r['P_tie']/1e6):.0f}",
-        'Künstliche Trägheit (BESS) [s]': f"{H_bess_s:.2f}"  # Neuer KPI
+        'Max. Import [MW]': f"{v['max_import_mw']:.0f}",
+        'Künstliche Trägheit (BESS) [s]': f"{v['h_bess_s']:.2f}"
     }
     return kpis, ttr_val
 
 
-def analyze_and_report_facts(r, kpis):
+DEFAULT_FACTS_PLOT = FactsPlot()  # Figuren bleiben zwischen Aufrufen erhalten (In-Place-Updates)
+
+
+def analyze_and_report_facts(r, kpis, facts_plot: FactsPlot = None):
     """
     Analysiert die Simulationsergebnisse und stellt wesentliche Fakten
     zur Frequenzregelung grafisch und textuell dar.
+    facts_plot: FactsPlot, dessen Figuren aktualisiert werden (Standard: DEFAULT_FACTS_PLOT).
     """
+    facts_plot = facts_plot or DEFAULT_FACTS_PLOT
     # Benötigte Rohdaten aus dem Ergebnis-Dictionary extrahieren
     cfg = r['cfg']
     t = r['t']
@@ -134,12 +130,7 @@ def analyze_and_report_facts(r, kpis):
     p_import_nadir = -P_tie_W[nadir_idx]
     total_support = p_fcr_nadir + p_afrr_nadir + p_import_nadir
     if total_support > 1e6:
-        labels = ['Primärregelung (FCR)', 'Regelleistung (aFRR/mFRR)', 'Import via Kuppelleitung']
-        sizes = [p_fcr_nadir, p_afrr_nadir, p_import_nadir]
-        fig1, ax1 = plt.subplots()
-        ax1.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, colors=['#ff9999','#66b3ff','#99ff99'])
-        ax1.axis('equal'); ax1.set_title(f"Leistungsbeitrag zur Stützung am Nadir ({total_support/1e6:.0f} MW)")
-        plt.show()
+        display(facts_plot.update_pie([p_fcr_nadir, p_afrr_nadir, p_import_nadir]))
     else:
         print("Kein signifikanter Leistungs-Support am Nadir.")
 
@@ -147,13 +138,4 @@ def analyze_and_report_facts(r, kpis):
     display(Markdown("\n**3. Visualisierung des Area Control Error (ACE)**"))
     df = f_bawu - cfg.F0
     ace_W = -(cfg.B_bias * df + P_tie_W)
-    fig_ace, ax_ace = plt.subplots(figsize=(14, 5))
-    ax_ace.plot(t, ace_W / 1e6, label='ACE')
-    ax_ace.axhline(cfg.ace_thresh / 1e6, color='r', linestyle='--', label='mFRR Aktivierungsschwelle')
-    ax_ace.axhline(-cfg.ace_thresh / 1e6, color='r', linestyle='--')
-    ax_ace.axhline(0, color='k', linestyle=':')
-    ax_ace.set_title('Verlauf des Area Control Error (ACE)'); ax_ace.set_xlabel('Zeit [s]'); ax_ace.set_ylabel('ACE [MW]')
-    ax_ace.grid(True); ax_ace.legend()
-    if r.get('plot_end_time'):
-        ax_ace.set_xlim(0, r['plot_end_time'])
-    plt.show()    
+    display(facts_plot.update_ace(t, ace_W / 1e6, cfg.ace_thresh / 1e6, r.get('plot_end_time')))    
@@ -0,0 +1,185 @@
+import time
+
+import numpy as np
+from src.sim_config import SimulationConfig
+from src.afrr_mfrr import AGC_Controller
+from src.engine import EngineConstants, EngineState, TimeAxis, allocate_outputs, advance, result_dict
+from src.simulation import simulate
+
+# -------------------- Profiling (Stufen-Timer & Regime-Zähler) --------------------
+# simulate() takes an optional StageProfiler that wraps its stage functions with timers and sees the
+# state around every step; without one simulate() runs uninstrumented. The fast engine has no stage
+# functions (the loop is inlined), so profile_fast() times engine.advance per model phase instead.
+STAGES = ['grid_state', 'update_fcr_power', 'update_afrr_mfrr_logic', 'update_bess_power_and_soc',
+          'dispatch_conventional_afrr', 'update_grid_frequencies', 'finalize_arrays']
+
+# Steps per regime (a step can be in several regimes)
+REGIMES = ['bess_at_soc_limit', 'bess_soc_clipped', 'bess_ramp_limited', 'bess_deadband',
+           'psh_ramp_limited', 'gud1_ramp_limited', 'gud2_ramp_limited', 'agc_saturated',
+           'lambda_rising', 'lambda_falling', 'mfrr_ramping']
+
+# Phases of profile_fast(): name and the EngineConstants step index where the phase starts
+PHASES = [('pre_fault', None), ('fcr_arrest', 'k_fault'), ('bess_active', 'k_bess'), ('psh_active', 'k_f'),
+          ('gud_active', 'k_g1'), ('bess_share', 'k_assist'), ('mfrr', 'k_mfrr')]
+
+
+def _count_regimes(counts: dict, state: dict, before: dict, k: int, df: float, agc: AGC_Controller, cfg: SimulationConfig):
+    """Classifies step k from the state before and after the control stages."""
+    if state['SoC'][k + 1] in (state['soc_min'], state['soc_max']):
+        counts['bess_at_soc_limit'] += 1
+    if state['P_k'][k] != state['p_k']:
+        counts['bess_soc_clipped'] += 1
+    dp_k = state['p_k'] - before['p_k']
+    if dp_k != 0.0 and dp_k in (cfg.k_ramp * cfg.dt, -cfg.bess_ramp_out_mw_per_sec * 1e6 * cfg.dt):
+        counts['bess_ramp_limited'] += 1
+    if abs(df) <= cfg.bess_deadband:
+        counts['bess_deadband'] += 1
+    for key, name, ramp in (('p_f', 'psh', cfg.f_ramp), ('p_g1', 'gud1', cfg.gud1_ramp), ('p_g2', 'gud2', cfg.gud2_ramp)):
+        step = state[key] - before[key]
+        if step != 0.0 and abs(step) == ramp * cfg.dt:
+            counts[f'{name}_ramp_limited'] += 1
+    if agc.integral_term in (-agc.P_max_charge, agc.P_max_discharge):
+        counts['agc_saturated'] += 1
+    if state['lambda_share'] > before['lambda_share']:
+        counts['lambda_rising'] += 1
+    elif state['lambda_share'] < before['lambda_share']:
+        counts['lambda_falling'] += 1
+    if state['p_mfrr'] > before['p_mfrr']:
+        counts['mfrr_ramping'] += 1
+
+
+class StageProfiler:
+    """Stage timers and regime counters for simulate(cfg, profiler=...)."""
+    def __init__(self, per_step: bool = False):
+        self.per_step = per_step
+        self.clock = time.perf_counter
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        self.counts = dict.fromkeys(REGIMES, 0)
+        self.step_times, self.n_steps = [], 0
+        self._t_step = None
+
+    def wrap(self, stages):
+        """Timed versions of the stage functions (same order as STAGES[1:])."""
+        return tuple(self._timed(name, fn) for name, fn in zip(STAGES[1:], stages))
+
+    def _timed(self, name, fn):
+        clock, totals = self.clock, self.totals
+
+        def stage(*args):
+            t0 = clock()
+            if self._t_step is not None:
+                totals['grid_state'] += t0 - self._t_step  # inline code between begin_step and the first stage
+                self._t_step = None
+            out = fn(*args)
+            dt = clock() - t0
+            totals[name] += dt
+            if self.per_step and name != 'finalize_arrays':
+                self._row.append(dt)
+            return out
+        return stage
+
+    def begin_step(self, state: dict):
+        self.before = {key: state[key] for key in ('p_k', 'p_f', 'p_g1', 'p_g2', 'p_mfrr', 'lambda_share')}
+        self._grid_before = self.totals['grid_state']
+        self._row = []
+        self._t_step = self.clock()
+
+    def end_step(self, state: dict, k: int, df: float, agc: AGC_Controller, cfg: SimulationConfig):
+        self.n_steps += 1
+        if self.per_step:
+            self.step_times.append([self.totals['grid_state'] - self._grid_before] + self._row)
+        _count_regimes(self.counts, state, self.before, k, df, agc, cfg)
+
+    def profile(self, total_s: float) -> dict:
+        stage_sum = sum(self.totals.values())
+        profile = {
+            'n_steps': self.n_steps, 'total_s': total_s,
+            'stages': {name: {'total_s': self.totals[name],
+                              'mean_us': self.totals[name] / (1 if name == 'finalize_arrays' else max(self.n_steps, 1)) * 1e6,
+                              'share': self.totals[name] / stage_sum if stage_sum else 0.0} for name in STAGES},
+            'regimes': self.counts,
+        }
+        if self.per_step:
+            profile['stage_times_s'] = np.array(self.step_times).reshape(-1, len(STAGES) - 1)
+        return profile
+
+
+def simulate_profiled(cfg: SimulationConfig, per_step: bool = False):
+    """
+    simulate() with stage timers and regime counters. Returns (result, profile) with
+    profile = {'n_steps', 'total_s', 'stages': {stage: {'total_s', 'mean_us', 'share'}},
+    'regimes': {regime: steps}} and, with per_step=True, 'stage_times_s' of shape (n_steps - 1, 6)
+    for the per-step stages (finalize_arrays runs once).
+    """
+    profiler = StageProfiler(per_step)
+    t0 = time.perf_counter()
+    res = simulate(cfg, profiler)
+    return res, profiler.profile(time.perf_counter() - t0)
+
+
+def fast_regimes(res: dict) -> dict:
+    """Regime counts derived from the signals of a simulate_fast() result (the regimes that need
+    controller internals, bess_soc_clipped/agc_saturated/lambda_*, are not included)."""
+    cfg = res['cfg']
+    c = EngineConstants(cfg)
+    df = res['f_bawu'][:-1] - cfg.F0
+    counts = {'bess_at_soc_limit': int(np.count_nonzero(np.isin(res['SoC'][1:], (c.soc_min, c.soc_max)))),
+              'bess_deadband': int(np.count_nonzero(np.abs(df) <= cfg.bess_deadband))}
+    steps = np.diff(res['P_k'][:-1], prepend=0.0)
+    counts['bess_ramp_limited'] = int(np.count_nonzero((steps != 0.0) & np.isin(steps, (c.k_ramp_up, c.k_ramp_down))))
+    for key, name, step in (('P_f', 'psh', c.f_step), ('P_g1', 'gud1', c.g1_step), ('P_g2', 'gud2', c.g2_step)):
+        d = np.abs(np.diff(res[key][:-1], prepend=0.0))
+        counts[f'{name}_ramp_limited'] = int(np.count_nonzero((d != 0.0) & (d == step)))
+    counts['mfrr_ramping'] = int(np.count_nonzero(np.diff(res['P_mfrr'][:-1], prepend=0.0) > 0.0))
+    return counts
+
+
+def profile_fast(cfg: SimulationConfig, repeat: int = 1):
+    """
+    Times simulate_fast()'s engine.advance per model phase (see PHASES; best of `repeat`).
+    Returns (result, profile) with profile = {'n_steps', 'total_s', 'phases': {phase: {'steps',
+    'total_s', 'mean_us', 'share'}}, 'regimes': fast_regimes(result)}.
+    """
+    axis = TimeAxis(cfg)
+    c = EngineConstants(cfg, axis)
+    n = axis.n_steps - 1
+    starts = [0] + [min(getattr(c, attr), n) for _, attr in PHASES[1:]]
+    bounds = sorted(set(starts) | {n})
+    best = None
+    for _ in range(repeat):
+        s, out = EngineState(cfg), allocate_outputs(axis.n_steps)
+        times = {}
+        for k0, k1 in zip(bounds[:-1], bounds[1:]):
+            t0 = time.perf_counter()
+            advance(s, c, out, k1)
+            times[k0] = time.perf_counter() - t0
+        best = times if best is None else {k: min(v, best[k]) for k, v in times.items()}
+    res = result_dict(s, c, out, axis.values(), cfg)
+    total = sum(best.values())
+    # A phase runs until the next phase in time starts (phases starting at the same step: the later one in PHASES)
+    order = sorted(range(len(PHASES)), key=lambda i: (starts[i], i))
+    phases = {}
+    for j, i in enumerate(order):
+        k0, k1 = starts[i], starts[order[j + 1]] if j + 1 < len(order) else n
+        t = sum(v for k, v in best.items() if k0 <= k < k1)
+        phases[PHASES[i][0]] = {'steps': k1 - k0, 'total_s': t, 'mean_us': t / (k1 - k0) * 1e6 if k1 > k0 else 0.0,
+                                'share': t / total if total else 0.0}
+    phases = {name: phases[name] for name, _ in PHASES}
+    return res, {'n_steps': n, 'total_s': total, 'phases': phases, 'regimes': fast_regimes(res)}
+
+
+def format_profile(profile: dict) -> str:
+    """Text table of a profile from simulate_profiled() or profile_fast()."""
+    lines = [f"{profile['n_steps']} Schritte, {profile['total_s'] * 1e3:.1f} ms gesamt (inkl. Timer-Overhead)"]
+    if 'stages' in profile:
+        lines.append(f"{'Stufe':<30}{'Summe [ms]':>12}{'je Schritt [µs]':>17}{'Anteil':>9}")
+        for name, s in profile['stages'].items():
+            lines.append(f"{name:<30}{s['total_s'] * 1e3:>12.1f}{s['mean_us']:>17.2f}{s['share']:>9.1%}")
+    if 'phases' in profile:
+        lines.append(f"{'Phase':<30}{'Schritte':>12}{'Summe [ms]':>12}{'je Schritt [µs]':>17}{'Anteil':>9}")
+        for name, s in profile['phases'].items():
+            lines.append(f"{name:<30}{s['steps']:>12}{s['total_s'] * 1e3:>12.1f}{s['mean_us']:>17.2f}{s['share']:>9.1%}")
+    lines.append(f"{'Regime':<30}{'Schritte':>12}{'Anteil':>17}")
+    for name, n in profile['regimes'].items():
+        lines.append(f"{name:<30}{n:>12}{n / max(profile['n_steps'], 1):>17.1%}")
+    return '\n'.join(lines)
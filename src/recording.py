@@ -0,0 +1,132 @@
+import numpy as np
+from src.sim_config import SimulationConfig
+from src.engine import SIGNALS, EngineConstants, EngineState, TimeAxis, allocate_outputs, advance
+from src.disturbance import as_disturbance
+
+# -------------------- Streaming / dezimierte Aufzeichnung --------------------
+DECIMATION_MODES = ('sample', 'mean', 'minmax')
+
+
+class Recorder:
+    """
+    Chooses which signals are kept and how they are reduced:
+    - decimation: number of engine steps per recorded sample (group)
+    - mode: 'sample' keeps the first value of each group, 'mean' the group mean, 'minmax' the group
+      minimum and maximum as '<name>_min'/'<name>_max' (peaks such as the nadir survive any decimation)
+    - dtype: storage type of the recorded values, e.g. np.float32
+    - chunk_samples: recorded samples per chunk; the engine runs decimation * chunk_samples steps per chunk
+    """
+    def __init__(self, signals=None, decimation: int = 1, mode: str = 'sample', dtype=np.float64, chunk_samples: int = 4096):
+        self.signals = list(signals) if signals is not None else list(SIGNALS)
+        unknown = set(self.signals) - set(SIGNALS)
+        if unknown:
+            raise ValueError(f"Unknown signals: {sorted(unknown)}. Available: {SIGNALS}")
+        if mode not in DECIMATION_MODES:
+            raise ValueError(f"mode must be one of {DECIMATION_MODES}, not '{mode}'.")
+        if decimation < 1 or chunk_samples < 1:
+            raise ValueError("decimation and chunk_samples must be >= 1.")
+        self.decimation, self.mode, self.dtype, self.chunk_samples = int(decimation), mode, dtype, int(chunk_samples)
+
+    @property
+    def block_steps(self) -> int:
+        return self.decimation * self.chunk_samples
+
+    def reduce(self, block: dict, t: np.ndarray, k0: int) -> dict:
+        """Reduces one block of raw samples (a whole number of groups, except at the end of the run)."""
+        d = self.decimation
+        n = len(t)
+        chunk = {'k0': k0, 't': t[::d].copy()}
+        for name in self.signals:
+            x = block[name]
+            if self.mode == 'sample':
+                chunk[name] = x[::d].astype(self.dtype)
+                continue
+            full, tail = (n // d) * d, n % d
+            groups = [x[:full].reshape(-1, d)] if full else []
+            if self.mode == 'mean':
+                parts = [g.mean(axis=1) for g in groups] + ([x[full:].mean(keepdims=True)] if tail else [])
+                chunk[name] = np.concatenate(parts).astype(self.dtype)
+            else:
+                lo = [g.min(axis=1) for g in groups] + ([x[full:].min(keepdims=True)] if tail else [])
+                hi = [g.max(axis=1) for g in groups] + ([x[full:].max(keepdims=True)] if tail else [])
+                chunk[name + '_min'] = np.concatenate(lo).astype(self.dtype)
+                chunk[name + '_max'] = np.concatenate(hi).astype(self.dtype)
+        return chunk
+
+
+def iter_blocks(cfg: SimulationConfig, block_steps: int = 4096, disturbance=None, fine_block: int = None,
+                fine_window: float = 60.0, breaks=()):
+    """
+    Runs the engine block by block into one reusable buffer and yields (block, t, k0) with raw
+    full-resolution views of every signal. The views are overwritten by the next block.
+    disturbance: optional Disturbance source(s) (see disturbance.py), streamed block by block.
+    fine_block: if given, blocks of only fine_block steps cover the fault and the fine_window
+    seconds after it; breaks are further steps at which a block ends (both for early-abort checks).
+    """
+    if disturbance is not None:
+        disturbance = as_disturbance(disturbance, cfg)
+    axis = TimeAxis(cfg)
+    c = EngineConstants(cfg, axis)
+    s = EngineState(cfg)
+    n_steps = axis.n_steps
+    buf = allocate_outputs(block_steps + 1)
+    ends = sorted(set(int(k) for k in breaks))
+    if fine_block is not None:
+        fine_end = min(n_steps - 1, c.k_fault + int(np.ceil(fine_window / cfg.dt)))
+        ends = sorted(set(ends) | set(range(c.k_fault, fine_end, fine_block)) | {fine_end})
+    k0 = 0
+    while k0 < n_steps - 1:
+        k1 = min(k0 + block_steps, n_steps - 1)
+        k1 = next((k for k in ends if k0 < k < k1), k1)
+        dist = None
+        if disturbance is not None:
+            dP = disturbance.block(k0, k1)
+            dist = (np.ascontiguousarray(dP[:, 0]), np.ascontiguousarray(dP[:, 1]))
+        advance(s, c, buf, k1, offset=k0, disturbance=dist)
+        m = k1 - k0
+        if k1 == n_steps - 1:
+            # Final sample, same padding as finalize_arrays
+            buf['f_bawu'][m], buf['f_fr'][m] = s.f_bawu, s.f_fr
+            for key in SIGNALS[2:]:
+                buf[key][m] = buf[key][m - 1]
+            m += 1
+        yield {name: arr[:m] for name, arr in buf.items()}, axis.values(k0, k0 + m), k0
+        k0 = k1
+
+
+def iter_chunks(cfg: SimulationConfig, recorder: Recorder = None, accumulators=(), disturbance=None):
+    """
+    Runs the engine block by block and yields one reduced chunk per block while the simulation runs.
+    Only one block of raw samples is held in memory, so peak memory does not depend on cfg.T.
+    Every chunk is a dict with 'k0' (first step), 't' and the recorded signals. Online KPI
+    accumulators (see kpi.py) are fed the raw, undecimated blocks.
+    """
+    recorder = recorder or Recorder()
+    for acc in accumulators:
+        acc.start(cfg)
+    for block, t, k0 in iter_blocks(cfg, recorder.block_steps, disturbance):
+        for acc in accumulators:
+            acc.update(block, t, k0)
+        yield recorder.reduce(block, t, k0)
+
+
+def run_streaming(cfg: SimulationConfig, callback, recorder: Recorder = None, accumulators=(), disturbance=None) -> int:
+    """Callback flavour of iter_chunks: callback(chunk) is called for every chunk. Returns the number of chunks."""
+    n_chunks = 0
+    for chunk in iter_chunks(cfg, recorder, accumulators, disturbance):
+        callback(chunk)
+        n_chunks += 1
+    return n_chunks
+
+
+def record(cfg: SimulationConfig, recorder: Recorder = None, accumulators=(), disturbance=None) -> dict:
+    """Collects all chunks into one (decimated) result dict with 'cfg', 'soc_min' and 'soc_max'."""
+    parts = {}
+    for chunk in iter_chunks(cfg, recorder, accumulators, disturbance):
+        for key, value in chunk.items():
+            if key != 'k0':
+                parts.setdefault(key, []).append(value)
+    res = {key: np.concatenate(values) for key, values in parts.items()}
+    c = EngineConstants(cfg)
+    res.update({'soc_min': c.soc_min, 'soc_max': c.soc_max, 'cfg': cfg})
+    return res
@@ -0,0 +1,67 @@
+import numpy as np
+from src.sim_config import SimulationConfig
+
+from src.fcr import update_fcr_power
+from src.afrr_mfrr import AGC_Controller, update_afrr_mfrr_logic
+from src.afrr_mfrr import dispatch_conventional_afrr
+from src.bess import update_bess_power_and_soc
+
+from src.helpers import initialize_state, finalize_arrays, update_grid_frequencies
+
+
+# -------------------- Main Simulation Function  --------------------
+def simulate(cfg: SimulationConfig, profiler=None):
+    """
+    Main simulation function that orchestrates the frequency regulation process.
+    This refactored version uses sub-functions to clearly separate logical steps.
+    profiler: optional profiling.StageProfiler that times every stage and sees the state around
+    every step (None: no instrumentation).
+    """
+    n_steps = int(np.ceil(cfg.T / cfg.dt)) + 1
+    state = initialize_state(cfg, n_steps)
+
+    total_afrr_cap = cfg.k_p_max + cfg.f_p_max + cfg.gud1_p_max + cfg.gud2_p_max
+    agc = AGC_Controller(cfg.dt, total_afrr_cap, cfg.k_p_max, cfg.B_bias)
+
+    stages = (update_fcr_power, update_afrr_mfrr_logic, update_bess_power_and_soc,
+              dispatch_conventional_afrr, update_grid_frequencies, finalize_arrays)
+    if profiler is not None:
+        stages = profiler.wrap(stages)
+    fcr_stage, afrr_stage, bess_stage, dispatch_stage, grid_stage, finalize_stage = stages
+
+    # Main simulation loop
+    for k in range(n_steps - 1):
+        if profiler is not None:
+            profiler.begin_step(state)
+        # 1. Determine the current grid state (deviations, RoCoF, tie-line flow)
+        t_k = state['t'][k]
+        deltaP = cfg.P_loss if t_k >= cfg.t_fault else 0.0
+        df = state['f_bawu'][k] - cfg.F0
+        df_fr = state['f_fr'][k] - cfg.F0
+        rocof = (df - state['prev_df']) / cfg.dt
+        state['prev_df'] = df
+        state['P_tie'][k] = cfg.T12 * (df - df_fr)
+
+        # 2. Calculate the response from Primary Control (FCR)
+        fcr_stage(state, k, df, df_fr, cfg)
+
+        # 3. Determine Secondary (aFRR) and Tertiary (mFRR) control actions
+        p_afrr_req = afrr_stage(state, k, df, state['P_tie'][k], agc, total_afrr_cap, cfg)
+
+        # 4. Calculate the BESS power response and update its State of Charge (SoC)
+        bess_stage(state, k, df, rocof, p_afrr_req, cfg)
+
+        # 5. Dispatch the remaining aFRR request to conventional power plants
+        dispatch_stage(state, k, p_afrr_req, cfg)
+
+        # 6. Update the grid frequencies for the next time step based on power imbalances
+        grid_stage(state, k, deltaP, df, df_fr, cfg)
+        if profiler is not None:
+            profiler.end_step(state, k, df, agc, cfg)
+
+    # Finalize arrays for consistent plotting
+    finalize_stage(state, n_steps)
+
+    # Return results
+    res = {**state, 'cfg': cfg}
+    return res
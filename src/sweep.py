@@ -0,0 +1,153 @@
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+from src.sim_config import SimulationConfig
+from src.engine import SIGNALS, simulate_fast
+from src.kpi import run_kpis, default_accumulators, collect_kpis, accumulate
+from src.recording import Recorder, record
+
+# -------------------- Parameter-Sweeps --------------------
+def expand_grid(**axes) -> list:
+    """Cartesian product of parameter axes, e.g. expand_grid(P_loss=[1e9, 3e9], bess_mode=['off', 'afrr_and_damping'])."""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[n] for n in names))]
+
+
+# Keys of a simulate() result that record() provides besides the engine signals
+_RECORDED_KEYS = set(SIGNALS) | {'t', 'soc_min', 'soc_max'}
+
+
+def run_case(index: int, params: dict, signals=()) -> dict:
+    """
+    Runs one SimulationConfig(**params) and keeps only its online KPIs and the selected signals.
+    signals may be any key of a simulate() result; engine signals and 't' are recorded while the
+    run streams, other keys (final controller states) need a full simulate_fast() run.
+    """
+    cfg = SimulationConfig(**params)
+    if not signals:
+        return {'index': index, 'params': params, 'kpis': run_kpis(cfg), 'signals': {}}
+    if set(signals) <= _RECORDED_KEYS:
+        accumulators = default_accumulators()
+        res = record(cfg, Recorder([name for name in signals if name in SIGNALS]), accumulators)
+        kpis = collect_kpis(accumulators, cfg)
+    else:
+        res = simulate_fast(cfg)
+        kpis = accumulate(res)
+    return {'index': index, 'params': params, 'kpis': kpis, 'signals': {name: res[name] for name in signals}}
+
+
+def _run_chunk(chunk, signals):
+    """Worker entry point: one pickled task holds several cases to amortize the IPC overhead."""
+    return [run_case(index, params, signals) for index, params in chunk]
+
+
+def _load_checkpoint(path: str, param_sets: list, signals) -> dict:
+    """Reads finished records from a JSONL checkpoint and checks that they belong to this sweep."""
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            i = rec['index']
+            if i >= len(param_sets) or rec['params'] != json.loads(json.dumps(param_sets[i])):
+                raise ValueError(f"Checkpoint {path} does not match the parameter sets of this sweep (run {i}).")
+            rec['signals'] = {}
+            if signals:
+                with np.load(_signal_file(path, i)) as npz:
+                    rec['signals'] = {name: npz[name] for name in signals}
+            done[i] = rec
+    return done
+
+
+def _signal_file(path: str, index: int) -> str:
+    return os.path.join(path + '.signals', f'{index}.npz')
+
+
+def _save_checkpoint(fh, path: str, rec: dict):
+    """Appends one finished record (signals go to a sidecar .npz so the JSONL stays small)."""
+    if rec['signals']:
+        os.makedirs(path + '.signals', exist_ok=True)
+        np.savez(_signal_file(path, rec['index']), **rec['signals'])
+    fh.write(json.dumps({k: rec[k] for k in ('index', 'params', 'kpis')}) + '\n')
+    fh.flush()
+
+
+def run_sweep(param_sets, signals=(), workers=None, chunksize=16, max_pending=None, ordered=True, checkpoint=None):
+    """
+    Runs every parameter set (SimulationConfig kwargs) on a process pool and yields one record per run:
+    {'index', 'params', 'kpis', 'signals'}. Only KPIs and the requested signals leave the workers,
+    and at most `max_pending` chunks are in flight, so memory stays flat for large sweeps.
+
+    ordered=True yields in input order, otherwise in completion order. With `checkpoint` (a JSONL path)
+    every finished run is appended to disk and a restarted sweep only computes the missing runs.
+    Results depend on the parameter sets only, never on the number of workers.
+    """
+    param_sets = list(param_sets)
+    signals = tuple(signals)
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+
+    done = _load_checkpoint(checkpoint, param_sets, signals)
+    todo = [(i, params) for i, params in enumerate(param_sets) if i not in done]
+    chunks = iter([todo[j:j + chunksize] for j in range(0, len(todo), chunksize)])
+    fh = open(checkpoint, 'a', encoding='utf-8') if checkpoint else None
+
+    def finished(records):
+        for rec in records:
+            if fh:
+                _save_checkpoint(fh, checkpoint, rec)
+            yield rec
+
+    # Records waiting for their turn (ordered mode) and the next index to hand out
+    buffer, next_index = dict(done), 0
+
+    def drain():
+        nonlocal next_index
+        while next_index in buffer:
+            yield buffer.pop(next_index)
+            next_index += 1
+
+    try:
+        if not ordered:
+            yield from done.values()
+            buffer.clear()
+        else:
+            yield from drain()
+
+        if workers == 1:
+            results = (_run_chunk(chunk, signals) for chunk in chunks)
+            for records in results:
+                for rec in finished(records):
+                    if ordered:
+                        buffer[rec['index']] = rec
+                        yield from drain()
+                    else:
+                        yield rec
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for chunk in itertools.islice(chunks, max_pending):
+                pending.add(pool.submit(_run_chunk, chunk, signals))
+            while pending:
+                complete, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in complete:
+                    for rec in finished(fut.result()):
+                        if ordered:
+                            buffer[rec['index']] = rec
+                        else:
+                            yield rec
+                    chunk = next(chunks, None)
+                    if chunk is not None:
+                        pending.add(pool.submit(_run_chunk, chunk, signals))
+                if ordered:
+                    yield from drain()
+    finally:
+        if fh:
+            fh.close()